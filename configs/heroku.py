@@ -10,9 +10,58 @@ MONGODB_SETTINGS={
 #JWT
 SECRET_KEY=os.getenv('SECRET_KEY','NONE')
 JWT_ACCESS_TOKEN_EXPIRES=os.getenv('JWT_ACCESS_TOKEN_EXPIRES',3600)
+JWT_REFRESH_TOKEN_EXPIRES=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 30 * 24 * 3600))
+JWT_REVOCATION_SYNC_INTERVAL=int(os.getenv('JWT_REVOCATION_SYNC_INTERVAL', 30))
 
 #Log
 LOG_LEVEL=os.getenv('LOG_LEVEL', None)
 LOG_FILE=os.getenv('LOG_FILE', None)
 LOG_MAX_SIZE = os.getenv('LOG_MAX_SIZE', 10000000)
-LOG_BACKUP_COUNT = os.getenv('LOG_BACKUP_COUNT', 3)
\ No newline at end of file
+LOG_BACKUP_COUNT = os.getenv('LOG_BACKUP_COUNT', 3)
+
+#Principal cache
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 1024))
+PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 300))
+
+#Count cache (totals of paginated lists)
+COUNT_CACHE_SIZE = int(os.getenv('COUNT_CACHE_SIZE', 4096))
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 60))
+
+#Tag cache (/recipes/tags and /ingredients/tags)
+TAG_CACHE_SIZE = int(os.getenv('TAG_CACHE_SIZE', 1024))
+TAG_CACHE_TTL = int(os.getenv('TAG_CACHE_TTL', 300))
+
+#Password hashing
+PASSWORD_HASH_POOL_SIZE = int(os.getenv('PASSWORD_HASH_POOL_SIZE', 2))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 8))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))
+BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+
+
+#Rate limiting (/auth/token and /auth/register)
+AUTH_RATE_LIMIT_EMAIL = os.getenv('AUTH_RATE_LIMIT_EMAIL', '10/60')
+AUTH_RATE_LIMIT_IP = os.getenv('AUTH_RATE_LIMIT_IP', '50/60')
+AUTH_RATE_LIMIT_BACKEND = os.getenv('AUTH_RATE_LIMIT_BACKEND', None)
+AUTH_RATE_LIMIT_TRUST_PROXY = True
+
+#Streamed list pages (stream=true)
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+#Response compression (gzip, and brotli when installed)
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 4))
+COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 256))
+COMPRESS_CACHE_TTL = int(os.getenv('COMPRESS_CACHE_TTL', 300))
+
+#Indexes (off, warn, fail or create)
+INDEX_CHECK = os.getenv('INDEX_CHECK', 'warn')
+
+#Search (text or memory)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'text')
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 256))
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 60))
+
+#Ingredient suggestions
+INGREDIENT_SUGGESTIONS_CACHE_SIZE = int(os.getenv('INGREDIENT_SUGGESTIONS_CACHE_SIZE', 1024))
+INGREDIENT_SUGGESTIONS_CACHE_TTL = int(os.getenv('INGREDIENT_SUGGESTIONS_CACHE_TTL', 300))
@@ -13,4 +13,19 @@ MONGODB_SETTINGS={
 }
 
 #JWT
-SECRET_KEY='NONE'
\ No newline at end of file
+SECRET_KEY='NONE'
+
+#Password hashing
+PASSWORD_HASH_POOL_SIZE=1
+PASSWORD_HASH_QUEUE_DEPTH=2
+BCRYPT_LOG_ROUNDS=4
+
+#Rate limiting
+AUTH_RATE_LIMIT_EMAIL='1000/60'
+AUTH_RATE_LIMIT_IP='1000/60'
+
+#Indexes
+INDEX_CHECK='create'
+
+#Search (text index not available in mongomock)
+SEARCH_BACKEND='memory'
@@ -15,4 +15,6 @@ MONGODB_SETTINGS={
 }
 
 #JWT
-SECRET_KEY='NONE'
\ No newline at end of file
+SECRET_KEY='NONE'
+#Indexes
+INDEX_CHECK='create'
@@ -0,0 +1,73 @@
+import argparse
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+
+parser = argparse.ArgumentParser(description='Measure CRUD latency while /auth/token is flooded with logins')
+parser.add_argument('base_url',
+                    help='API base URL, e.g. http://localhost:8000/api/v1')
+parser.add_argument('email',
+                    help='Email of an existing user')
+parser.add_argument('password',
+                    help='Password of an existing user')
+parser.add_argument('--login-threads', type=int, default=16,
+                    help='Concurrent clients posting to /auth/token')
+parser.add_argument('--crud-threads', type=int, default=4,
+                    help='Concurrent clients reading /ingredients')
+parser.add_argument('--duration', type=float, default=30,
+                    help='Benchmark duration in seconds')
+args = parser.parse_args()
+
+def request(path, payload=None, token=None):
+  headers = {'Content-Type': 'application/json'}
+  if token is not None:
+    headers['Authorization'] = 'Bearer {}'.format(token)
+
+  data = json.dumps(payload).encode() if payload is not None else None
+  req = urllib.request.Request(args.base_url + path, data=data, headers=headers)
+
+  start = time.perf_counter()
+  try:
+    with urllib.request.urlopen(req) as resp:
+      status, body = resp.status, resp.read()
+  except urllib.error.HTTPError as e:
+    status, body = e.code, e.read()
+
+  return status, body, time.perf_counter() - start
+
+def percentile(values, p):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * p))] if values else float('nan')
+
+status, body, _ = request('/auth/token', {'email': args.email, 'password': args.password})
+token = json.loads(body.decode())['access_token']
+
+deadline = time.perf_counter() + args.duration
+login_results = []
+crud_results = []
+
+def login_client():
+  while time.perf_counter() < deadline:
+    status, _, elapsed = request('/auth/token', {'email': args.email, 'password': args.password})
+    login_results.append((status, elapsed))
+
+def crud_client():
+  while time.perf_counter() < deadline:
+    status, _, elapsed = request('/ingredients?per_page=10', token=token)
+    crud_results.append((status, elapsed))
+
+threads = [threading.Thread(target=login_client) for _ in range(args.login_threads)] + \
+  [threading.Thread(target=crud_client) for _ in range(args.crud_threads)]
+
+for t in threads:
+  t.start()
+for t in threads:
+  t.join()
+
+for name, results in (('login', login_results), ('crud', crud_results)):
+  latencies = [elapsed * 1000 for status, elapsed in results if status < 500]
+  rejected = len([status for status, _ in results if status == 503])
+  print('{:6} requests: {:6d}  503: {:6d}  p50: {:8.1f}ms  p99: {:8.1f}ms'.format(
+    name, len(results), rejected, percentile(latencies, 0.5), percentile(latencies, 0.99)))
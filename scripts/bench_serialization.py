@@ -0,0 +1,61 @@
+import argparse
+import sys
+import timeit
+
+from bson import ObjectId
+
+sys.path.insert(0, '.')
+
+from flask import jsonify
+
+from weekly_menu import create_app
+from weekly_menu.webapp.api.models import Recipe
+from weekly_menu.webapp.api.serialization import json_response, to_serializable, orjson
+
+parser = argparse.ArgumentParser(description='Compare the per-item cost of the Document and raw list serialization')
+parser.add_argument('--config', default='pytest',
+                    help='Configuration name (see configs/)')
+parser.add_argument('--sizes', default='10,100,1000',
+                    help='Comma separated page sizes')
+parser.add_argument('--repeat', type=int, default=20,
+                    help='Serializations timed for each size')
+args = parser.parse_args()
+
+app = create_app(args.config)
+owner = ObjectId()
+
+def make_recipe(i):
+  return {
+    '_id': ObjectId(),
+    'owner': owner,
+    'insert_timestamp': 1580000000000 + i,
+    'update_timestamp': 1580000000000 + i,
+    'name': 'Recipe {}'.format(i),
+    'description': 'A description of the recipe number {}'.format(i),
+    'preparation': 'Some preparation steps. ' * 20,
+    'availabilityMonths': [1, 2, 3],
+    'ingredients': [{'quantity': 1.5, 'unitOfMeasure': 'g', 'required': True, 'ingredient': ObjectId()} for _ in range(8)],
+    'servs': 4,
+    'rating': 3,
+    'tags': ['quick', 'cheap']
+  }
+
+def documents(items):
+  # Same work done for a paginated list before: hydrate, to_mongo(), jsonify
+  return jsonify({'results': [Recipe._from_son(item).to_mongo() for item in items]}).data
+
+def raw(items):
+  return json_response({'results': [to_serializable(Recipe, item) for item in items]}).data
+
+with app.test_request_context():
+  print('encoder: {}'.format('orjson' if orjson is not None else 'json'))
+
+  # Database reads are left out, as_pymongo() returns the same dicts the queryset hydrates
+  for size in [int(size) for size in args.sizes.split(',')]:
+    items = [make_recipe(i) for i in range(size)]
+
+    assert documents(items) == raw(items), 'outputs differ'
+
+    for name, func in (('documents', documents), ('raw', raw)):
+      elapsed = min(timeit.repeat(lambda: func(items), number=1, repeat=args.repeat))
+      print('{:5d} items {:>10}: {:8.1f}us per item'.format(size, name, elapsed / size * 1000000))
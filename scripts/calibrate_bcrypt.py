@@ -0,0 +1,40 @@
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+parser = argparse.ArgumentParser(description='Recommend a BCRYPT_LOG_ROUNDS value for this host')
+parser.add_argument('--budget-ms', type=float, default=250,
+                    help='Maximum time a single hash should take, in milliseconds')
+parser.add_argument('--samples', type=int, default=5,
+                    help='Hashes computed for each cost')
+parser.add_argument('--min-cost', type=int, default=4,
+                    help='Lowest cost to measure')
+parser.add_argument('--max-cost', type=int, default=16,
+                    help='Highest cost to measure')
+args = parser.parse_args()
+
+password = b'calibration-password'
+recommended = None
+
+for cost in range(args.min_cost, args.max_cost + 1):
+  timings = []
+  for _ in range(args.samples):
+    start = time.perf_counter()
+    bcrypt.hashpw(password, bcrypt.gensalt(cost))
+    timings.append((time.perf_counter() - start) * 1000)
+
+  median = statistics.median(timings)
+  print('cost {:2d}: median {:9.1f}ms  max {:9.1f}ms'.format(cost, median, max(timings)))
+
+  if median <= args.budget_ms:
+    recommended = cost
+  else:
+    # Every additional round doubles the time, no point in going further
+    break
+
+if recommended is None:
+  print('No cost fits in {}ms, use BCRYPT_LOG_ROUNDS={}'.format(args.budget_ms, args.min_cost))
+else:
+  print('Recommended: BCRYPT_LOG_ROUNDS={}'.format(recommended))
@@ -0,0 +1,39 @@
+import argparse
+import sys
+
+sys.path.insert(0, '.')
+
+from weekly_menu import create_app
+
+parser = argparse.ArgumentParser(description='Build the missing indexes and report the unused ones')
+parser.add_argument('--config', default='heroku',
+                    help='Configuration name (see configs/)')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Only report, do not build anything')
+args = parser.parse_args()
+
+app = create_app(args.config)
+
+from weekly_menu.webapp.api.indexes import MANAGED_MODELS, missing_indexes, unused_indexes
+
+with app.app_context():
+  for model in MANAGED_MODELS:
+    collection = model._get_collection_name()
+    missing = missing_indexes(model)
+
+    for key in missing:
+      print('{}: missing {}'.format(collection, key))
+
+    if missing and not args.dry_run:
+      # Built in background (see BaseDocument meta), the command returns before the build is complete
+      model.ensure_indexes()
+      print('{}: building {} indexes'.format(collection, len(missing)))
+
+    unused = unused_indexes(model)
+
+    if unused is None:
+      print('{}: index usage not available on this server'.format(collection))
+      continue
+
+    for name, declared in unused:
+      print('{}: unused {}{}'.format(collection, name, '' if declared else ' (not declared, can be dropped)'))
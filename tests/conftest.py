@@ -7,9 +7,12 @@ from uuid import uuid4
 
 from flask.testing import FlaskClient
 from weekly_menu import create_app
+from weekly_menu.webapp.api import count_cache, tag_cache, search_index
 
 from weekly_menu.webapp.api.models import Ingredient, Menu, Recipe, User, ShoppingList
 from weekly_menu.webapp.api.v1.auth import encode_password
+from weekly_menu.webapp.api.v1.ingredients import ingredient_suggestions
+from weekly_menu.webapp.compression import compression
 
 TEST_USERNAME = 'test'
 TEST_PASSWORD = 'pippo@franco.it'
@@ -29,6 +32,13 @@ def clear_db():
   Ingredient.drop_collection()
   ShoppingList.drop_collection()
 
+  # Collections are dropped behind the back of the per-worker caches
+  count_cache.clear()
+  tag_cache.clear()
+  search_index.clear()
+  ingredient_suggestions.clear()
+  compression.clear()
+
 @pytest.fixture(scope='session')
 def app():
   config_name = os.environ.get('CONFIG_NAME', 'pytest')
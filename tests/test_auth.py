@@ -1,4 +1,11 @@
+import os
 import pytest
+import threading
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from uuid import uuid4
 
 from conftest import TEST_EMAIL, TEST_PASSWORD
 from test_shopping_list import get_all_shopping_list
@@ -7,7 +14,17 @@ from flask import jsonify
 from flask.json import dumps, loads
 from flask.testing import FlaskClient
 
-from weekly_menu.webapp.api.models import User
+from flask_jwt_extended import create_access_token, decode_token
+
+from weekly_menu.webapp.api import principal_cache, UserPrincipal
+from weekly_menu.webapp.api.exceptions import Forbidden, ServiceUnavailable
+from bson import ObjectId
+
+from weekly_menu.webapp.api.models import User, RevokedToken, ShoppingList
+from weekly_menu.webapp.api.v1.auth import encode_password, password_hasher, revocation_store, rate_limiter
+from weekly_menu.webapp.api.v1.auth import revocation, hashing
+from weekly_menu.webapp.api.v1.auth.throttling import MongoBucketBackend, parse_limit
+from weekly_menu.webapp.api.v1.auth.hashing import get_hash_cost
 
 def register_user(client: FlaskClient, name: str, password: str, email: str):
   return client.post('/api/v1/auth/register', json={
@@ -102,3 +119,345 @@ def test_logout(client: FlaskClient):
 
   assert response.status_code == 204
 
+  # The body is optional, also with a JSON Content-Type
+  response = client.post('/api/v1/auth/logout', content_type='application/json')
+
+  assert response.status_code == 204
+
+def test_logout_revokes_tokens(client: FlaskClient, auth_headers):
+  response = client.post('/api/v1/auth/token', json={
+    'email': TEST_EMAIL,
+    'password': TEST_PASSWORD
+  })
+
+  headers = {'Authorization': 'Bearer {}'.format(response.json['access_token'])}
+  refresh = response.json['refresh_token']
+
+  response = client.get('/api/v1/ingredients', headers=headers)
+
+  assert response.status_code == 200
+
+  response = client.post('/api/v1/auth/logout', json={'refresh_token': refresh}, headers=headers)
+
+  assert response.status_code == 204
+
+  response = client.get('/api/v1/ingredients', headers=headers)
+
+  assert response.status_code == 401
+
+  response = refresh_token(client, refresh)
+
+  assert response.status_code == 401
+
+  response = client.get('/api/v1/ingredients', headers=auth_headers)
+
+  assert response.status_code == 200
+
+def test_revocation_store_sync(app):
+  with app.app_context():
+    jti = uuid4().hex
+
+    revocation_store.sync()
+
+    # Revoked by another worker
+    RevokedToken(jti=jti, revoked_at=datetime.utcnow(), expires=datetime.utcnow() + timedelta(minutes=1)).save()
+
+    assert revocation_store.is_revoked(jti) == False
+
+    revocation_store._next_sync = 0
+
+    assert revocation_store.is_revoked(jti) == True
+
+def test_revocation_store_single_sync(app, monkeypatch):
+  with app.app_context():
+    syncs = []
+    sync_query = revocation.RevokedToken.objects
+    monkeypatch.setattr(revocation, 'RevokedToken', type('RevokedToken', (), {
+      'objects': staticmethod(lambda **kwargs: syncs.append(kwargs) or sync_query(**kwargs))
+    }))
+
+    revocation_store._next_sync = 0
+
+    # Threads waiting for the lock don't sync again
+    with revocation_store._lock:
+      threads = [threading.Thread(target=revocation_store.is_revoked, args=(uuid4().hex,)) for _ in range(4)]
+      for thread in threads:
+        thread.start()
+
+    for thread in threads:
+      thread.join()
+
+    assert len(syncs) == 1
+
+def legacy_auth_headers(app, email):
+  with app.app_context():
+    token = create_access_token(identity=email)
+
+  return {'Authorization': 'Bearer {}'.format(token)}
+
+def test_principal_cache(app, client: FlaskClient, auth_headers):
+  headers = legacy_auth_headers(app, TEST_EMAIL)
+
+  principal_cache.clear()
+
+  response = client.get('/api/v1/ingredients', headers=headers)
+
+  assert response.status_code == 200
+
+  stats = principal_cache.stats()
+
+  response = client.get('/api/v1/ingredients', headers=headers)
+
+  assert response.status_code == 200 \
+    and principal_cache.stats()['hits'] == stats['hits'] + 1 \
+    and principal_cache.stats()['misses'] == stats['misses']
+
+  User.objects(email=TEST_EMAIL).get().save()
+
+  assert principal_cache.stats()['size'] == 0
+
+def test_user_claims(app, client: FlaskClient):
+  register_user(client, 'claims', 'password', 'claims@pluto.com')
+
+  response = client.post('/api/v1/auth/token', json={
+    'email': 'claims@pluto.com',
+    'password': 'password'
+  })
+
+  with app.app_context():
+    claims = decode_token(response.json['access_token'])['user_claims']
+
+  assert claims['id'] == response.json['user_id'] and claims['ver'] == 0
+
+  headers = {'Authorization': 'Bearer {}'.format(response.json['access_token'])}
+
+  stats = principal_cache.stats()
+
+  response = client.get('/api/v1/ingredients', headers=headers)
+
+  assert response.status_code == 200 and principal_cache.stats() == stats
+
+  user = User.objects(email='claims@pluto.com').get()
+  user.password = encode_password('new-password')
+  user.save()
+
+  assert user.version == 1
+
+  assert UserPrincipal('claims@pluto.com', user.id, 1).email == 'claims@pluto.com'
+
+  with pytest.raises(Forbidden):
+    UserPrincipal('claims@pluto.com', user.id, 0).email
+
+  user.delete()
+
+class FakeExecutor:
+  created = []
+
+  def __init__(self, max_workers, broken=False):
+    self.broken = broken
+    FakeExecutor.created.append(self)
+
+  def submit(self, fn, *args):
+    if self.broken:
+      raise BrokenProcessPool('a process terminated abruptly')
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+  def shutdown(self, wait=True):
+    pass
+
+def test_password_hashing_broken_pool(app, monkeypatch):
+  FakeExecutor.created.clear()
+  monkeypatch.setattr(hashing, 'ProcessPoolExecutor', FakeExecutor)
+  monkeypatch.setattr(password_hasher, '_slots', threading.BoundedSemaphore(1))
+  monkeypatch.setattr(password_hasher, '_executor', FakeExecutor(1, broken=True))
+  monkeypatch.setattr(password_hasher, '_executor_pid', os.getpid())
+
+  # Replaced by a new pool
+  pw_hash = password_hasher.generate_password_hash('password', 4)
+  assert password_hasher.check_password_hash(pw_hash, 'password') == True
+  assert len(FakeExecutor.created) == 2 and password_hasher._executor is FakeExecutor.created[1]
+
+  # Unavailable if the new one breaks too
+  monkeypatch.setattr(hashing, 'ProcessPoolExecutor', lambda max_workers: FakeExecutor(max_workers, broken=True))
+  password_hasher._executor.broken = True
+
+  with pytest.raises(ServiceUnavailable):
+    password_hasher.generate_password_hash('password', 4)
+
+def test_password_hashing_admission_control(client: FlaskClient, auth_headers):
+  slots = password_hasher._slots
+  password_hasher._slots = threading.BoundedSemaphore(1)
+  password_hasher._slots.acquire()
+
+  try:
+    response = client.post('/api/v1/auth/token', json={
+      'email': TEST_EMAIL,
+      'password': TEST_PASSWORD
+    })
+
+    assert response.status_code == 503 \
+      and response.json['error'] == 'SERVICE_UNAVAILABLE' \
+      and response.headers['Retry-After'] == '1'
+
+    response = client.get('/api/v1/ingredients', headers=auth_headers)
+
+    assert response.status_code == 200
+  finally:
+    password_hasher._slots = slots
+
+  response = client.post('/api/v1/auth/token', json={
+    'email': TEST_EMAIL,
+    'password': TEST_PASSWORD
+  })
+
+  assert response.status_code == 200
+
+def test_password_rehash_on_login(client: FlaskClient):
+  register_user(client, 'rehash', 'password', 'rehash@pluto.com')
+
+  user = User.objects(email='rehash@pluto.com').get()
+  User.objects(id=user.id).update_one(set__password=password_hasher.generate_password_hash('password', 5))
+
+  assert get_hash_cost(User.objects(id=user.id).get().password) == 5
+
+  response = client.post('/api/v1/auth/token', json={
+    'email': 'rehash@pluto.com',
+    'password': 'password'
+  })
+
+  user = User.objects(id=user.id).get()
+
+  assert response.status_code == 200 \
+    and get_hash_cost(user.password) == password_hasher.log_rounds \
+    and user.version == 0
+
+  response = client.post('/api/v1/auth/token', json={
+    'email': 'rehash@pluto.com',
+    'password': 'password'
+  })
+
+  assert response.status_code == 200
+
+  user.delete()
+
+def refresh_token(client: FlaskClient, refresh_token: str):
+  return client.post('/api/v1/auth/refresh', headers={'Authorization': 'Bearer {}'.format(refresh_token)})
+
+def test_refresh_token(client: FlaskClient, auth_headers):
+  response = client.post('/api/v1/auth/token', json={
+    'email': TEST_EMAIL,
+    'password': TEST_PASSWORD
+  })
+
+  assert response.status_code == 200 and response.json['refresh_token'] is not None
+
+  first_refresh_token = response.json['refresh_token']
+
+  response = refresh_token(client, response.json['access_token'])
+
+  assert response.status_code == 422
+
+  response = refresh_token(client, first_refresh_token)
+
+  assert response.status_code == 200 \
+    and response.json['refresh_token'] != first_refresh_token \
+    and response.json['expires_in'] == 60
+
+  second_refresh_token = response.json['refresh_token']
+
+  response = client.get('/api/v1/ingredients', headers={'Authorization': 'Bearer {}'.format(response.json['access_token'])})
+
+  assert response.status_code == 200
+
+  # Reusing a rotated token revokes the whole family
+  response = refresh_token(client, first_refresh_token)
+
+  assert response.status_code == 401 and response.json['error'] == 'BAD_CREDENTIALS'
+
+  response = refresh_token(client, second_refresh_token)
+
+  assert response.status_code == 401
+
+def test_rate_limit(client: FlaskClient, auth_headers):
+  limits = rate_limiter.limits
+  rate_limiter.limits = dict(limits, email=parse_limit('2/60'))
+
+  try:
+    for _ in range(2):
+      response = client.post('/api/v1/auth/token', json={
+        'email': 'throttled@pluto.com',
+        'password': 'wrong-password'
+      })
+
+      assert response.status_code == 401
+
+    response = client.post('/api/v1/auth/token', json={
+      'email': 'Throttled@pluto.com',
+      'password': 'wrong-password'
+    })
+
+    assert response.status_code == 429 \
+      and response.json['error'] == 'TOO_MANY_REQUESTS' \
+      and int(response.headers['Retry-After']) > 0
+
+    response = client.post('/api/v1/auth/register', json={
+      'name': 'throttled',
+      'password': 'password',
+      'email': 'throttled@pluto.com'
+    })
+
+    assert response.status_code == 429 and User.objects(email='throttled@pluto.com').first() is None
+
+    response = client.post('/api/v1/auth/token', json={
+      'email': TEST_EMAIL,
+      'password': TEST_PASSWORD
+    })
+
+    assert response.status_code == 200
+  finally:
+    rate_limiter.limits = limits
+
+def test_shared_rate_limit_backend(app):
+  backend = MongoBucketBackend()
+  capacity, rate = parse_limit('2/60')
+
+  with app.app_context():
+    assert backend.take('ip:shared', capacity, rate, 1000) == 0
+    assert backend.take('ip:shared', capacity, rate, 1000) == 0
+    assert backend.take('ip:shared', capacity, rate, 1000) == 30
+
+    # One token is refilled every 30 seconds
+    assert backend.take('ip:shared', capacity, rate, 1030) == 0
+    assert backend.take('ip:shared', capacity, rate, 1030) > 0
+
+def test_registration_retry(client: FlaskClient):
+  response = register_user(client, 'retry', 'password', 'retry@pluto.com')
+
+  assert response.status_code == 200
+
+  user_id = response.json['_id']
+
+  assert ShoppingList.objects(owner=user_id).get().id == ObjectId(user_id)
+
+  response = register_user(client, 'retry', 'password', 'retry@pluto.com')
+
+  assert response.status_code == 200 \
+    and response.json['_id'] == user_id \
+    and ShoppingList.objects(owner=user_id).count() == 1
+
+  # Registration interrupted before creating the shopping list
+  ShoppingList.objects(owner=user_id).delete()
+
+  response = register_user(client, 'retry', 'password', 'retry@pluto.com')
+
+  assert response.status_code == 200 \
+    and response.json['_id'] == user_id \
+    and ShoppingList.objects(owner=user_id).count() == 1
+
+  response = register_user(client, 'retry', 'other-password', 'retry@pluto.com')
+
+  assert response.status_code == 409 and response.json['error'] == 'DUPLICATE_ENTRY'
+
+  User.objects(id=user_id).get().delete()
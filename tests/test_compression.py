@@ -0,0 +1,106 @@
+import gzip
+import importlib
+import pytest
+
+from flask.testing import FlaskClient
+
+from weekly_menu.webapp.compression import compression, brotli
+
+from test_recipe import create_recipe
+
+# The module, shadowed in api by the decorator of the same name
+conditional = importlib.import_module('weekly_menu.webapp.api.conditional')
+
+def get_recipes(client, auth_headers, accept_encoding, query=''):
+  return client.get('/api/v1/recipes?' + query, headers=dict(auth_headers, **{'Accept-Encoding': accept_encoding}))
+
+def create_recipes(client, auth_headers, count):
+  for i in range(count):
+    create_recipe(client, {'name': 'Recipe {}'.format(i), 'preparation': 'Some preparation steps. ' * 20}, auth_headers)
+
+def test_gzip(client: FlaskClient, auth_headers):
+  create_recipes(client, auth_headers, 5)
+
+  plain = get_recipes(client, auth_headers, 'identity')
+  response = get_recipes(client, auth_headers, 'gzip')
+
+  assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+  assert 'Accept-Encoding' in plain.headers['Vary']
+
+  assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+  assert int(response.headers['Content-Length']) < len(plain.data)
+  assert gzip.decompress(response.data) == plain.data
+
+def test_small_responses_not_compressed(client: FlaskClient, auth_headers):
+  create_recipes(client, auth_headers, 1)
+
+  response = get_recipes(client, auth_headers, 'gzip', 'fields=name')
+
+  assert response.status_code == 200 and len(response.data) < compression.min_size
+  assert 'Content-Encoding' not in response.headers
+
+@pytest.mark.skipif(brotli is None, reason='brotli not installed')
+def test_brotli_preferred(client: FlaskClient, auth_headers):
+  create_recipes(client, auth_headers, 5)
+
+  plain = get_recipes(client, auth_headers, 'identity')
+  response = get_recipes(client, auth_headers, 'gzip, deflate, br')
+
+  assert response.headers['Content-Encoding'] == 'br'
+  assert brotli.decompress(response.data) == plain.data
+
+  response = get_recipes(client, auth_headers, 'gzip;q=1.0, br;q=0.5')
+  assert response.headers['Content-Encoding'] == 'gzip'
+
+def test_compressed_once_per_etag(client: FlaskClient, auth_headers, monkeypatch):
+  create_recipes(client, auth_headers, 5)
+
+  calls = []
+  compress = compression.compress
+  monkeypatch.setattr(compression, 'compress', lambda data, encoding: calls.append(encoding) or compress(data, encoding))
+
+  first = get_recipes(client, auth_headers, 'gzip')
+  second = get_recipes(client, auth_headers, 'gzip')
+
+  assert first.data == second.data and calls == ['gzip']
+
+  # A new representation is compressed again
+  create_recipes(client, auth_headers, 1)
+  get_recipes(client, auth_headers, 'gzip')
+
+  assert calls == ['gzip', 'gzip']
+
+def test_same_etag_different_body(client: FlaskClient, auth_headers, monkeypatch):
+  # Weak ETags may be shared by different bodies
+  monkeypatch.setattr(conditional, 'make_etag', lambda *parts: 'same')
+  create_recipes(client, auth_headers, 5)
+
+  first = get_recipes(client, auth_headers, 'gzip')
+  create_recipes(client, auth_headers, 1)
+  plain = get_recipes(client, auth_headers, 'identity')
+  second = get_recipes(client, auth_headers, 'gzip')
+
+  assert first.headers['ETag'] == second.headers['ETag']
+  assert gzip.decompress(second.data) == plain.data != gzip.decompress(first.data)
+
+def test_streamed_compression(client: FlaskClient, auth_headers):
+  create_recipes(client, auth_headers, 5)
+
+  batch_size = client.application.config.get('STREAM_BATCH_SIZE')
+  client.application.config['STREAM_BATCH_SIZE'] = 2
+
+  try:
+    plain = get_recipes(client, auth_headers, 'identity')
+    response = client.get('/api/v1/recipes?stream=true', headers=dict(auth_headers, **{'Accept-Encoding': 'gzip'}), buffered=False)
+
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in response.headers
+
+    # Every batch is flushed as its own compressed chunk
+    chunks = list(response.response)
+    assert len(chunks) > 3
+    assert gzip.decompress(b''.join(chunks)) == plain.data
+  finally:
+    if batch_size is None:
+      del client.application.config['STREAM_BATCH_SIZE']
+    else:
+      client.application.config['STREAM_BATCH_SIZE'] = batch_size
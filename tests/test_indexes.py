@@ -0,0 +1,34 @@
+import pytest
+
+from weekly_menu.webapp.api.indexes import MANAGED_MODELS, IndexCheck, MissingIndexesError, check_indexes, missing_indexes, ensure_indexes
+from weekly_menu.webapp.api.models import Recipe
+
+class AppStub:
+  def __init__(self, index_check):
+    self.config = {'INDEX_CHECK': index_check}
+
+
+def test_owner_prefixed_indexes(app):
+  for model in MANAGED_MODELS:
+    assert any(spec['fields'][0] == ('owner', 1) for spec in model._meta['index_specs'])
+    assert model._meta['auto_create_index'] == False
+
+def test_index_check(app):
+  ensure_indexes()
+
+  for model in MANAGED_MODELS:
+    assert missing_indexes(model) == []
+
+  Recipe._get_collection().drop_index('owner_1_ingredients.ingredient_1')
+
+  assert missing_indexes(Recipe) == [[('owner', 1), ('ingredients.ingredient', 1)]]
+
+  # Warnings only
+  check_indexes(AppStub(IndexCheck.WARN))
+
+  with pytest.raises(MissingIndexesError):
+    check_indexes(AppStub(IndexCheck.FAIL))
+
+  check_indexes(AppStub(IndexCheck.CREATE))
+
+  assert missing_indexes(Recipe) == []
@@ -7,6 +7,10 @@ from flask import jsonify
 from flask.json import dumps, loads
 from flask.testing import FlaskClient
 
+from weekly_menu.webapp.api import count_cache
+from weekly_menu.webapp.api.models import Ingredient
+from weekly_menu.webapp.api.pagination import paginate_by_cursor
+
 
 def create_ingredient(client, json, auth_headers):
     return client.post('/api/v1/ingredients', json=json, headers=auth_headers)
@@ -28,9 +32,15 @@ def delete_ingredient(client, ing_id, auth_headers):
     return client.delete('/api/v1/ingredients/{}'.format(ing_id), headers=auth_headers)
 
 
+def suggest_ingredients(client, auth_headers, prefix, limit=10):
+    return client.get('/api/v1/ingredients/suggest?prefix={}&limit={}'.format(prefix, limit), headers=auth_headers)
+
 def get_all_ingredients(client, auth_headers, page=1, per_page=10, order_by='', desc=False):
     return client.get('/api/v1/ingredients?page={}&per_page={}&order_by={}&desc={}'.format(page, per_page, order_by, desc), headers=auth_headers)
 
+def get_ingredients_after(client, auth_headers, after='', per_page=10, order_by='', desc=False):
+    return client.get('/api/v1/ingredients?after={}&per_page={}&order_by={}&desc={}'.format(after or '', per_page, order_by, desc), headers=auth_headers)
+
 def get_ingredient(client, ing_id, auth_headers):
     return client.get('/api/v1/ingredients/{}'.format(ing_id), headers=auth_headers)
 
@@ -451,4 +461,143 @@ def test_get_last_updated(client: FlaskClient, auth_headers):
         and len(response.json['results']) == 1 \
         and response.json['results'][0]['_id'] == idx_2 \
         and response.json['results'][0]['update_timestamp'] == update_timestamp_2
-        
\ No newline at end of file
+        
+
+def test_cursor_pagination(client: FlaskClient, auth_headers):
+    for name, description in (('Tomato', 'red'), ('Basil', None), ('Garlic', 'white'), ('Basil', 'green'), ('Onion', None)):
+        create_ingredient(client, {'name': name, 'description': description} if description else {'name': name}, auth_headers)
+
+    def walk(**kwargs):
+        results, after = [], ''
+        while after is not None:
+            response = get_ingredients_after(client, auth_headers, after=after, per_page=2, **kwargs)
+
+            assert response.status_code == 200 and 'pages' not in response.json
+
+            results += response.json['results']
+            after = response.json['next']
+        return results
+
+    results = walk(order_by='name')
+
+    assert [ing['name'] for ing in results] == ['Basil', 'Basil', 'Garlic', 'Onion', 'Tomato'] \
+        and results[0]['_id'] < results[1]['_id']
+
+    results = walk(order_by='name', desc=True)
+
+    assert [ing['name'] for ing in results] == ['Tomato', 'Onion', 'Garlic', 'Basil', 'Basil'] \
+        and results[3]['_id'] > results[4]['_id']
+
+    # Documents without the sort field come first in ascending order and last in descending one
+    def walk_queryset(field, desc):
+        results, after = [], ''
+        while after is not None:
+            page = paginate_by_cursor(Ingredient.objects, field, desc, after, 2)
+            results += page.items
+            after = page.next
+        return results
+
+    results = walk_queryset('description', False)
+
+    assert [ing.description for ing in results][2:] == ['green', 'red', 'white'] \
+        and len(results) == 5
+
+    results = walk_queryset('description', True)
+
+    assert [ing.description for ing in results][:3] == ['white', 'red', 'green'] \
+        and len(results) == 5
+
+    results = walk()
+
+    assert len(results) == 5 and [ing['_id'] for ing in results] == sorted(ing['_id'] for ing in results)
+
+    response = get_ingredients_after(client, auth_headers, after='not-a-cursor')
+
+    assert response.status_code == 400
+
+def test_optional_total(client: FlaskClient, auth_headers):
+    ham = create_ingredient(client, {'name': 'ham'}, auth_headers).json
+    create_ingredient(client, {'name': 'tuna'}, auth_headers)
+
+    response = client.get('/api/v1/ingredients?with_total=false', headers=auth_headers)
+
+    assert response.status_code == 200 \
+        and len(response.json['results']) == 2 \
+        and 'pages' not in response.json and 'total' not in response.json
+
+    response = get_all_ingredients(client, auth_headers, per_page=1)
+
+    assert response.status_code == 200 and response.json['pages'] == 2 and response.json['total'] == 2
+
+    stats = count_cache.stats()
+
+    create_ingredient(client, {'name': 'cheese'}, auth_headers)
+
+    response = get_all_ingredients(client, auth_headers, per_page=1)
+
+    assert response.status_code == 200 \
+        and response.json['total'] == 3 \
+        and count_cache.stats()['hits'] == stats['hits'] + 1
+
+    delete_ingredient(client, ham['_id'], auth_headers)
+
+    response = get_ingredients_after(client, auth_headers, per_page=1)
+
+    assert 'total' not in response.json and response.json['next'] is not None
+
+    response = client.get('/api/v1/ingredients?after=&with_total=true', headers=auth_headers)
+
+    assert response.json['total'] == 2 and count_cache.stats()['hits'] == stats['hits'] + 2
+
+def test_sortable_fields(client: FlaskClient, auth_headers):
+    for name in ('Tomato', 'Basil', 'Garlic'):
+        create_ingredient(client, {'name': name, 'description': name.lower()}, auth_headers)
+
+    response = get_all_ingredients(client, auth_headers, order_by='name', desc=True)
+
+    assert response.status_code == 200 \
+        and [ing['name'] for ing in response.json['results']] == ['Tomato', 'Garlic', 'Basil']
+
+    response = get_all_ingredients(client, auth_headers, order_by='description')
+
+    assert response.status_code == 400 \
+        and response.json['error'] == 'BAD_REQUEST' \
+        and set(response.json['details']) == {'_id', 'name', 'update_timestamp'}
+
+    response = get_ingredients_after(client, auth_headers, order_by='description')
+
+    assert response.status_code == 400
+
+def test_suggest_ingredients(client: FlaskClient, auth_headers, auth_headers_2):
+    for name in ('Tomato', 'tofu', 'Tuna', 'Basil', 'Tomato sauce'):
+        create_ingredient(client, {'name': name}, auth_headers)
+    create_ingredient(client, {'name': 'Toast'}, auth_headers_2)
+
+    response = suggest_ingredients(client, auth_headers, 'to')
+
+    assert response.status_code == 200 \
+        and [ing['name'] for ing in response.json['results']] == ['tofu', 'Tomato', 'Tomato sauce']
+
+    response = suggest_ingredients(client, auth_headers, 'TO', limit=2)
+
+    assert [ing['name'] for ing in response.json['results']] == ['tofu', 'Tomato']
+
+    # Index is kept up to date by writes
+    tuna = suggest_ingredients(client, auth_headers, 'tu').json['results'][0]
+    patch_ingredient(client, tuna['_id'], {'name': 'Tortellini'}, auth_headers)
+    patch_ingredient(client, tuna['_id'], {'description': 'fresh'}, auth_headers)
+    ham = create_ingredient(client, {'name': 'Tonno'}, auth_headers).json
+    delete_ingredient(client, ham['_id'], auth_headers)
+
+    response = suggest_ingredients(client, auth_headers, 'to')
+
+    assert [ing['name'] for ing in response.json['results']] == ['tofu', 'Tomato', 'Tomato sauce', 'Tortellini'] \
+        and response.json['results'][3]['_id'] == tuna['_id']
+
+    response = suggest_ingredients(client, auth_headers, 'tu')
+
+    assert response.status_code == 200 and response.json['results'] == []
+
+    response = suggest_ingredients(client, auth_headers, 'to', limit=0)
+
+    assert response.status_code == 400
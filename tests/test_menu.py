@@ -1,4 +1,5 @@
 import pytest
+import mongomock
 
 from datetime import datetime
 from uuid import uuid4
@@ -7,6 +8,8 @@ from flask import jsonify
 from flask.json import dumps, loads
 from flask.testing import FlaskClient
 
+from weekly_menu.webapp.api.models import Recipe, Menu
+
 from test_ingredient import create_ingredient, delete_ingredient
 from test_recipe import create_recipe
 
@@ -38,6 +41,14 @@ def get_all_menus_by_day(client, auth_headers, day):
     return client.get('/api/v1/menus?day={}'.format(day), headers=auth_headers)
 
 
+def get_all_menus_in_range(client, auth_headers, from_day='', to_day=''):
+    return client.get('/api/v1/menus?from={}&to={}'.format(from_day, to_day), headers=auth_headers)
+
+
+def get_menus_of_week(client, auth_headers, iso_week):
+    return client.get('/api/v1/menus/week/{}'.format(iso_week), headers=auth_headers)
+
+
 def test_not_authorized(client: FlaskClient):
     response = get_all_menus(client, {})
 
@@ -173,6 +184,67 @@ def test_retrieve_menu_by_day(client: FlaskClient, auth_headers):
     assert response.status_code == 400
 
 
+def test_retrieve_menu_by_range(client: FlaskClient, auth_headers):
+    for day in ('2019-12-29', '2019-12-30', '2020-01-01', '2020-01-05', '2020-01-06'):
+        create_menu(client, {'name': day, 'date': day}, auth_headers)
+
+    response = get_all_menus_in_range(client, auth_headers, '2019-12-30', '2020-01-05')
+
+    assert response.status_code == 200 and len(response.json['results']) == 3
+
+    response = client.get('/api/v1/menus?from=2020-01-01&order_by=date', headers=auth_headers)
+
+    assert response.status_code == 200 \
+        and [menu['date'] for menu in response.json['results']] == ['2020-01-01', '2020-01-05', '2020-01-06']
+
+    response = get_all_menus_in_range(client, auth_headers, to_day='2019-12-30')
+
+    assert response.status_code == 200 and len(response.json['results']) == 2
+
+    response = client.get('/api/v1/menus?of=2020-01-05', headers=auth_headers)
+
+    assert response.status_code == 200 and len(response.json['results']) == 1
+
+    # KO tests
+
+    response = get_all_menus_in_range(client, auth_headers, '2020-01-05', '2019-12-30')
+
+    assert response.status_code == 400
+
+    response = get_all_menus_in_range(client, auth_headers, '2020-02-30')
+
+    assert response.status_code == 400
+
+
+def test_retrieve_menu_by_week(client: FlaskClient, auth_headers):
+    for day in ('2019-12-29', '2020-01-01', '2019-12-30', '2020-01-05', '2020-01-06'):
+        create_menu(client, {'name': day, 'date': day}, auth_headers)
+
+    response = get_menus_of_week(client, auth_headers, '2020-W01')
+
+    assert response.status_code == 200 \
+        and response.json['from'] == '2019-12-30' and response.json['to'] == '2020-01-05' \
+        and [menu['date'] for menu in response.json['results']] == ['2019-12-30', '2020-01-01', '2020-01-05']
+
+    response = get_menus_of_week(client, auth_headers, '2019W52')
+
+    assert response.status_code == 200 and len(response.json['results']) == 1
+
+    # KO tests
+
+    response = get_menus_of_week(client, auth_headers, '2019-W53')
+
+    assert response.status_code == 400
+
+    response = get_menus_of_week(client, auth_headers, '2020-01')
+
+    assert response.status_code == 400
+
+    response = get_menus_of_week(client, auth_headers, '0000-W01')
+
+    assert response.status_code == 400 and response.json['error'] == 'BAD_REQUEST'
+
+
 def test_create_menu(client: FlaskClient, auth_headers):
     ham = create_ingredient(client, {
         'name': 'ham'
@@ -527,4 +599,81 @@ def test_get_last_updated(client: FlaskClient, auth_headers):
         and len(response.json['results']) == 1 \
         and response.json['results'][0]['_id'] == idx_2 \
         and response.json['results'][0]['update_timestamp'] == update_timestamp_2
-        
\ No newline at end of file
+        
+def test_expand_recipes(client: FlaskClient, auth_headers, monkeypatch):
+    tuna = create_ingredient(client, {'name': 'tuna'}, auth_headers).json
+    recipes = [create_recipe(client, {'name': 'Recipe {}'.format(i), 'ingredients': [{'ingredient': tuna['_id']}]}, auth_headers).json for i in range(3)]
+
+    # A week of menus, each one with two recipes
+    for day in range(1, 8):
+        create_menu(client, {
+            'date': '2020-01-{:02d}'.format(5 + day),
+            'recipes': [recipes[day % 3]['_id'], recipes[(day + 1) % 3]['_id']]
+        }, auth_headers)
+
+    finds = []
+    find = mongomock.collection.Collection.find
+    monkeypatch.setattr(mongomock.collection.Collection, 'find', lambda self, *args, **kwargs: finds.append(self.name) or find(self, *args, **kwargs))
+
+    response = client.get('/api/v1/menus/week/2020-W02?expand=recipes', headers=auth_headers)
+
+    assert response.status_code == 200 and len(response.json['results']) == 7
+    assert finds.count(Recipe._get_collection_name()) == 1
+
+    names = {recipe['_id']: recipe['name'] for recipe in recipes}
+    for menu in response.json['results']:
+        assert all(recipe['name'] == names[recipe['_id']] for recipe in menu['recipes'])
+        assert menu['recipes'][0]['ingredients'][0]['ingredient'] == tuna['_id']
+
+    finds.clear()
+    response = client.get('/api/v1/menus?per_page=7&expand=recipes', headers=auth_headers)
+
+    assert response.status_code == 200 and finds.count(Recipe._get_collection_name()) == 1
+    assert all(isinstance(recipe, dict) for menu in response.json['results'] for recipe in menu['recipes'])
+
+    menu = response.json['results'][0]
+    response = client.get('/api/v1/menus/{}?expand=recipes'.format(menu['_id']), headers=auth_headers)
+
+    assert response.status_code == 200 and response.json['recipes'] == menu['recipes']
+    assert 'ETag' not in response.headers
+
+    # Only the fields projected are expanded
+    response = client.get('/api/v1/menus/{}?fields=date&expand=recipes'.format(menu['_id']), headers=auth_headers)
+    assert response.status_code == 200 and 'recipes' not in response.json
+
+    response = client.get('/api/v1/menus?expand=ingredients', headers=auth_headers)
+    assert response.status_code == 400 and response.json['details'] == ['recipes']
+
+def test_recipe_delete_updates_menus(client: FlaskClient, auth_headers):
+    recipes = [create_recipe(client, {'name': 'Recipe {}'.format(i)}, auth_headers).json for i in range(2)]
+    menu = create_menu(client, {'date': '2020-01-06', 'recipes': [recipe['_id'] for recipe in recipes]}, auth_headers).json
+
+    menu_etag = get_menu(client, menu['_id'], auth_headers).headers['ETag']
+    list_etag = get_all_menus(client, auth_headers).headers['ETag']
+
+    assert client.delete('/api/v1/recipes/{}'.format(recipes[0]['_id']), headers=auth_headers).status_code == 204
+
+    response = client.get('/api/v1/menus/{}'.format(menu['_id']), headers=dict(auth_headers, **{'If-None-Match': menu_etag}))
+    assert response.status_code == 200 and response.json['recipes'] == [recipes[1]['_id']]
+    assert response.json['update_timestamp'] > menu['update_timestamp']
+
+    response = client.get('/api/v1/menus?page=1&per_page=10&order_by=&desc=False', headers=dict(auth_headers, **{'If-None-Match': list_etag}))
+    assert response.status_code == 200 and response.json['results'][0]['recipes'] == [recipes[1]['_id']]
+
+def test_recipe_delete_single_update(client: FlaskClient, auth_headers, monkeypatch):
+    recipe = create_recipe(client, {'name': 'Pasta'}, auth_headers).json
+    menus = [create_menu(client, {'date': '2020-01-{:02d}'.format(6 + day), 'recipes': [recipe['_id']]}, auth_headers).json for day in range(3)]
+
+    updates = []
+    for method in ('update_one', 'update_many'):
+        original = getattr(mongomock.collection.Collection, method)
+        monkeypatch.setattr(mongomock.collection.Collection, method,
+                            lambda self, *args, original=original, method=method, **kwargs: updates.append((self.name, method)) or original(self, *args, **kwargs))
+
+    assert client.delete('/api/v1/recipes/{}'.format(recipe['_id']), headers=auth_headers).status_code == 204
+
+    # Every menu is updated by the same query, past the most recent of them
+    assert [update for update in updates if update[0] == Menu._get_collection_name()] == [(Menu._get_collection_name(), 'update_many')]
+
+    timestamps = {get_menu(client, menu['_id'], auth_headers).json['update_timestamp'] for menu in menus}
+    assert len(timestamps) == 1 and timestamps.pop() > max(menu['update_timestamp'] for menu in menus)
@@ -0,0 +1,138 @@
+import pytest
+
+from datetime import date, datetime, timezone
+
+from bson import ObjectId
+from flask.testing import FlaskClient
+
+msgpack = pytest.importorskip('msgpack')
+
+from weekly_menu.webapp.api.serialization import OBJECT_ID_EXT_TYPE, dumps_msgpack, loads_msgpack
+
+from test_ingredient import create_ingredient
+from test_recipe import create_recipe
+from test_menu import create_menu
+
+MSGPACK = 'application/msgpack'
+
+def msgpack_headers(auth_headers):
+  return dict(auth_headers, **{'Accept': MSGPACK})
+
+def post_msgpack(client, url, data, auth_headers):
+  return client.post(url, data=dumps_msgpack(data), content_type=MSGPACK, headers=msgpack_headers(auth_headers))
+
+def send_msgpack(client, method, url, data, auth_headers):
+  return client.open(url, method=method, data=dumps_msgpack(data), content_type=MSGPACK, headers=msgpack_headers(auth_headers))
+
+def ext_hook(code, data):
+  assert code == OBJECT_ID_EXT_TYPE
+  return ObjectId(data)
+
+def unpack(response):
+  return msgpack.unpackb(response.data, raw=False, ext_hook=ext_hook, timestamp=3)
+
+def test_list_and_instance(client: FlaskClient, auth_headers):
+  tuna = create_ingredient(client, {'name': 'Tuna'}, auth_headers).json
+  recipe = create_recipe(client, {'name': 'Pasta', 'ingredients': [{'ingredient': tuna['_id'], 'quantity': 1.5}]}, auth_headers).json
+
+  response = client.get('/api/v1/recipes', headers=msgpack_headers(auth_headers))
+  expected = client.get('/api/v1/recipes', headers=auth_headers).json
+
+  assert response.status_code == 200 and response.mimetype == MSGPACK
+
+  # ObjectIds are packed as they are, everything else as in JSON
+  results = unpack(response)
+  assert results['results'][0]['_id'] == ObjectId(recipe['_id'])
+  assert results['results'][0]['ingredients'][0]['ingredient'] == ObjectId(tuna['_id'])
+  assert results['total'] == expected['total'] and results['results'][0]['name'] == 'Pasta'
+
+  response = client.get('/api/v1/recipes/{}'.format(recipe['_id']), headers=msgpack_headers(auth_headers))
+  assert response.status_code == 200 and unpack(response)['ingredients'][0]['quantity'] == 1.5
+
+  # Representations have their own ETags
+  assert response.headers['ETag'] != client.get('/api/v1/recipes/{}'.format(recipe['_id']), headers=auth_headers).headers['ETag']
+
+  # JSON remains the default
+  response = client.get('/api/v1/recipes', headers=dict(auth_headers, **{'Accept': '*/*'}))
+  assert response.mimetype == 'application/json'
+
+def test_dates(client: FlaskClient, auth_headers):
+  menu = post_msgpack(client, '/api/v1/menus', {'date': datetime(2019, 9, 1, tzinfo=timezone.utc)}, auth_headers)
+
+  assert menu.status_code == 201 and menu.mimetype == MSGPACK
+
+  menu = unpack(menu)
+  assert menu['date'] == datetime(2019, 9, 1, tzinfo=timezone.utc)
+
+  assert client.get('/api/v1/menus/{}'.format(menu['_id']), headers=auth_headers).json['date'] == '2019-09-01'
+
+def test_payloads(client: FlaskClient, auth_headers):
+  tuna = create_ingredient(client, {'name': 'Tuna'}, auth_headers).json
+
+  # ObjectIds are accepted both packed and as strings
+  response = post_msgpack(client, '/api/v1/recipes', {
+    'name': 'Pasta',
+    'ingredients': [{'ingredient': msgpack.ExtType(OBJECT_ID_EXT_TYPE, ObjectId(tuna['_id']).binary)}, {'ingredient': tuna['_id']}]
+  }, auth_headers)
+
+  assert response.status_code == 201
+  assert [ingredient['ingredient'] for ingredient in unpack(response)['ingredients']] == [ObjectId(tuna['_id'])] * 2
+
+  response = post_msgpack(client, '/api/v1/recipes', {'name': 'Pasta', 'unknown': 1}, auth_headers)
+  assert response.status_code == 400
+
+  response = client.post('/api/v1/recipes', data=b'\xc1', content_type=MSGPACK, headers=auth_headers)
+  assert response.status_code == 400 and response.json['error'] == 'BAD_REQUEST'
+
+  response = client.post('/api/v1/recipes', data=b'\x81\xa4name', content_type='text/plain', headers=auth_headers)
+  assert response.status_code == 400
+
+def test_embedded_documents(client: FlaskClient, auth_headers):
+  tuna = create_ingredient(client, {'name': 'Tuna'}, auth_headers).json
+  tomato = create_ingredient(client, {'name': 'Tomatoes'}, auth_headers).json
+  recipe = create_recipe(client, {'name': 'Pasta', 'ingredients': [{'ingredient': tomato['_id']}]}, auth_headers).json
+
+  # Recipe ingredients
+  url = '/api/v1/recipes/{}/ingredients'.format(recipe['_id'])
+
+  response = post_msgpack(client, url, {'ingredient': tuna['_id'], 'quantity': 2}, auth_headers)
+  assert response.status_code == 201 and unpack(response) == {'ingredient': ObjectId(tuna['_id']), 'quantity': 2}
+
+  response = send_msgpack(client, 'PATCH', url + '/' + tuna['_id'], {'quantity': 3}, auth_headers)
+  assert response.status_code == 200 and unpack(response)['quantity'] == 3
+
+  response = send_msgpack(client, 'PUT', url + '/' + tuna['_id'], {'ingredient': tuna['_id'], 'quantity': 4}, auth_headers)
+  assert response.status_code == 200 and unpack(response) == {'ingredient': ObjectId(tuna['_id']), 'quantity': 4}
+
+  # Shopping list items
+  shopping_list = client.post('/api/v1/shopping-lists', json={'name': 'Home', 'items': [{'item': tomato['_id'], 'checked': False}]}, headers=auth_headers).json
+  url = '/api/v1/shopping-lists/{}/items'.format(shopping_list['_id'])
+
+  response = post_msgpack(client, url, {'item': tuna['_id'], 'checked': False}, auth_headers)
+  assert response.status_code == 201 and unpack(response)['items'][1]['item'] == ObjectId(tuna['_id'])
+
+  response = client.get(url + '/' + tuna['_id'], headers=msgpack_headers(auth_headers))
+  assert response.status_code == 200 and unpack(response)['item'] == ObjectId(tuna['_id'])
+
+  response = send_msgpack(client, 'PATCH', url + '/' + tuna['_id'], {'checked': True}, auth_headers)
+  assert response.status_code == 200 and unpack(response)['checked'] == True
+
+  response = send_msgpack(client, 'PUT', url + '/' + tuna['_id'], {'item': tuna['_id'], 'checked': False, 'quantity': 1}, auth_headers)
+  assert response.status_code == 200 and unpack(response)['quantity'] == 1
+
+  # Lists of documents
+  recipe = create_recipe(client, {'name': 'Salad'}, auth_headers).json
+  menu = create_menu(client, {'date': '2019-09-01'}, auth_headers).json
+
+  response = post_msgpack(client, '/api/v1/menus/{}/recipes'.format(menu['_id']), {'recipe_id': recipe['_id']}, auth_headers)
+  assert response.status_code == 200 and [recipe['_id'] for recipe in unpack(response)] == [ObjectId(recipe['_id'])]
+
+def test_loads_msgpack():
+  assert loads_msgpack(dumps_msgpack({'day': date(2020, 1, 2), 'at': datetime(2020, 1, 2, 10, 30), 'ids': [ObjectId('5e4ae04561fe8235a5a18824')]})) == {
+    'day': '2020-01-02',
+    'at': '2020-01-02T10:30:00+00:00',
+    'ids': ['5e4ae04561fe8235a5a18824']
+  }
+
+  with pytest.raises(ValueError):
+    loads_msgpack(dumps_msgpack(msgpack.ExtType(OBJECT_ID_EXT_TYPE, b'short')))
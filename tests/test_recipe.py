@@ -7,6 +7,11 @@ from flask import jsonify
 from flask.json import dumps, loads
 from flask.testing import FlaskClient
 
+from bson import ObjectId
+
+from weekly_menu.webapp.api.models import Recipe
+from weekly_menu.webapp.api.filters import CompiledFilters, FilterSpec
+
 from test_ingredient import create_ingredient, delete_ingredient
 
 def create_recipe(client, json, auth_headers):
@@ -27,6 +32,12 @@ def get_recipe(client, recipe_id, auth_headers):
 def get_all_recipes(client, auth_headers, page=1, per_page=10, order_by='', desc=False):
   return client.get('/api/v1/recipes?page={}&per_page={}&order_by={}&desc={}'.format(page, per_page, order_by, desc), headers=auth_headers)
 
+def search_recipes(client, auth_headers, q, page=1, per_page=10, order_by=''):
+  return client.get('/api/v1/recipes?q={}&page={}&per_page={}&order_by={}'.format(q, page, per_page, order_by), headers=auth_headers)
+
+def get_recipe_tags(client, auth_headers):
+  return client.get('/api/v1/recipes/tags', headers=auth_headers)
+
 def test_not_authorized(client: FlaskClient):
   response = get_all_recipes(client, {})
   
@@ -404,4 +415,252 @@ def test_get_last_updated(client: FlaskClient, auth_headers):
         and len(response.json['results']) == 1 \
         and response.json['results'][0]['_id'] == idx_2 \
         and response.json['results'][0]['update_timestamp'] == update_timestamp_2
-        
\ No newline at end of file
+        
+
+def test_search_recipes(client: FlaskClient, auth_headers, auth_headers_2):
+    carbonara = create_recipe(client, {'name': 'Carbonara', 'description': 'pasta with eggs and bacon', 'tags': ['pasta']}, auth_headers).json
+    omelette = create_recipe(client, {'name': 'Omelette', 'preparation': 'beat the eggs'}, auth_headers).json
+    pasta = create_recipe(client, {'name': 'Pasta e fagioli', 'note': 'Tuscan'}, auth_headers).json
+    create_recipe(client, {'name': 'Pasta al pomodoro'}, auth_headers_2)
+
+    response = search_recipes(client, auth_headers, 'pasta')
+
+    # Name matches weigh more than tags and description
+    assert response.status_code == 200 \
+        and response.json['total'] == 2 \
+        and [recipe['_id'] for recipe in response.json['results']] == [pasta['_id'], carbonara['_id']]
+
+    response = search_recipes(client, auth_headers, 'EGGS')
+
+    assert response.status_code == 200 \
+        and [recipe['_id'] for recipe in response.json['results']] == [carbonara['_id'], omelette['_id']]
+
+    response = search_recipes(client, auth_headers, 'eggs', page=2, per_page=1)
+
+    assert response.status_code == 200 \
+        and response.json['pages'] == 2 \
+        and [recipe['_id'] for recipe in response.json['results']] == [omelette['_id']]
+
+    response = search_recipes(client, auth_headers, 'eggs', page=3, per_page=1)
+
+    assert response.status_code == 404
+
+    response = search_recipes(client, auth_headers, 'eggs', order_by='name')
+
+    assert response.status_code == 200 \
+        and [recipe['name'] for recipe in response.json['results']] == ['Carbonara', 'Omelette']
+
+    # Index is rebuilt after writes
+    patch_recipe(client, omelette['_id'], {'name': 'Pasta frittata'}, auth_headers)
+
+    response = search_recipes(client, auth_headers, 'pasta')
+
+    assert response.status_code == 200 and response.json['total'] == 3
+
+    response = search_recipes(client, auth_headers, 'risotto')
+
+    assert response.status_code == 200 and response.json['results'] == []
+
+    response = client.get('/api/v1/menus?q=pasta', headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_recipe_tags(client: FlaskClient, auth_headers, auth_headers_2):
+    carbonara = create_recipe(client, {'name': 'Carbonara', 'tags': ['pasta', 'quick']}, auth_headers).json
+    create_recipe(client, {'name': 'Lasagne', 'tags': ['pasta', 'oven']}, auth_headers)
+    create_recipe(client, {'name': 'Omelette'}, auth_headers)
+    create_recipe(client, {'name': 'Pizza', 'tags': ['oven']}, auth_headers_2)
+
+    response = get_recipe_tags(client, auth_headers)
+
+    assert response.status_code == 200 \
+        and response.json['results'] == [
+            {'tag': 'pasta', 'count': 2},
+            {'tag': 'oven', 'count': 1},
+            {'tag': 'quick', 'count': 1}
+        ]
+
+    # Writes invalidate the cached facets
+    patch_recipe(client, carbonara['_id'], {'tags': ['quick']}, auth_headers)
+
+    response = get_recipe_tags(client, auth_headers)
+
+    assert response.json['results'] == [
+        {'tag': 'oven', 'count': 1},
+        {'tag': 'pasta', 'count': 1},
+        {'tag': 'quick', 'count': 1}
+    ]
+
+    response = get_recipe_tags(client, auth_headers_2)
+
+    assert response.json['results'] == [{'tag': 'oven', 'count': 1}]
+
+def test_filter_recipes(client: FlaskClient, auth_headers):
+    create_recipe(client, {'name': 'Carbonara', 'tags': ['pasta', 'quick'], 'rating': 3, 'estimatedCookingTime': 15}, auth_headers)
+    create_recipe(client, {'name': 'Lasagne', 'tags': ['pasta', 'oven'], 'rating': 2, 'estimatedCookingTime': 60}, auth_headers)
+    create_recipe(client, {'name': 'Omelette', 'availabilityMonths': [1, 2], 'rating': 1}, auth_headers)
+
+    def names(response):
+        assert response.status_code == 200
+        return sorted(recipe['name'] for recipe in response.json['results'])
+
+    assert names(client.get('/api/v1/recipes?tags=pasta', headers=auth_headers)) == ['Carbonara', 'Lasagne']
+    assert names(client.get('/api/v1/recipes?tags__all=pasta,oven', headers=auth_headers)) == ['Lasagne']
+    assert names(client.get('/api/v1/recipes?tags__in=quick,oven&rating__gte=3', headers=auth_headers)) == ['Carbonara']
+    assert names(client.get('/api/v1/recipes?estimatedCookingTime__lte=30', headers=auth_headers)) == ['Carbonara']
+    assert names(client.get('/api/v1/recipes?availabilityMonths=2', headers=auth_headers)) == ['Omelette']
+
+    response = client.get('/api/v1/recipes?tags=pasta&with_total=true', headers=auth_headers)
+
+    assert response.json['total'] == 2
+
+    # KO tests
+
+    response = client.get('/api/v1/recipes?rating=good', headers=auth_headers)
+
+    assert response.status_code == 400
+
+    response = client.get('/api/v1/recipes?preparation=boil', headers=auth_headers)
+
+    assert response.status_code == 400 and 'rating__gte' in response.json['details']
+
+    response = client.get('/api/v1/recipes?rating__lt=2', headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_filters_require_index(monkeypatch):
+    monkeypatch.setattr(Recipe, 'FILTERS', {'note': FilterSpec(str)})
+
+    with pytest.raises(ValueError, match='index'):
+        CompiledFilters(Recipe)
+
+def test_sparse_fieldsets(client: FlaskClient, auth_headers):
+    carbonara = create_recipe(client, {'name': 'Carbonara', 'preparation': 'a very long text', 'tags': ['pasta'], 'rating': 3}, auth_headers).json
+    create_recipe(client, {'name': 'Lasagne', 'preparation': 'another long text', 'rating': 2}, auth_headers)
+
+    response = client.get('/api/v1/recipes?fields=name,rating&order_by=name', headers=auth_headers)
+
+    assert response.status_code == 200 \
+        and response.json['results'] == [
+            {'_id': carbonara['_id'], 'name': 'Carbonara', 'rating': 3},
+            {'_id': response.json['results'][1]['_id'], 'name': 'Lasagne', 'rating': 2}
+        ]
+
+    # Keyset pagination needs the sort field
+    response = client.get('/api/v1/recipes?fields=tags&order_by=name&after=&per_page=1', headers=auth_headers)
+
+    assert response.status_code == 200 \
+        and response.json['results'] == [{'_id': carbonara['_id'], 'name': 'Carbonara', 'tags': ['pasta']}]
+
+    response = client.get('/api/v1/recipes?fields=name&order_by=name&after={}&per_page=1'.format(response.json['next']), headers=auth_headers)
+
+    assert [recipe['name'] for recipe in response.json['results']] == ['Lasagne']
+
+    response = client.get('/api/v1/recipes?fields=name&q=pasta', headers=auth_headers)
+
+    assert response.json['results'] == [{'_id': carbonara['_id'], 'name': 'Carbonara'}]
+
+    response = client.get('/api/v1/recipes/{}?fields=tags'.format(carbonara['_id']), headers=auth_headers)
+
+    assert response.status_code == 200 and response.json == {'_id': carbonara['_id'], 'tags': ['pasta']}
+
+    # KO tests
+
+    response = client.get('/api/v1/recipes?fields=name,password', headers=auth_headers)
+
+    assert response.status_code == 400 and 'preparation' in response.json['details']
+
+    response = client.get('/api/v1/recipes/{}?fields=password'.format(carbonara['_id']), headers=auth_headers)
+
+    assert response.status_code == 400
+
+def test_raw_read_path(client: FlaskClient, auth_headers):
+    tuna = create_ingredient(client, {'name': 'Tuna'}, auth_headers).json
+
+    first = create_recipe(client, {
+        'name': 'Pâtes au thon \U0001f41f',
+        'ingredients': [{'ingredient': tuna['_id'], 'quantity': 1.5, 'unitOfMeasure': 'kg'}],
+        'availabilityMonths': [1, 12]
+    }, auth_headers).json
+    second = create_recipe(client, {'name': 'Tiny\x7f', 'ingredients': [{'ingredient': tuna['_id'], 'quantity': 1e-7}]}, auth_headers).json
+
+    # Fields set later are stored after the other ones, values stored with other types
+    patch_recipe(client, first['_id'], {'note': 'patched', 'servs': 2}, auth_headers)
+    Recipe._get_collection().update_one({'_id': ObjectId(second['_id'])}, {'$set': {'rating': 2.0, 'legacy': True}})
+
+    # The second page holds a float rendered differently by orjson, the standard encoder is used
+    for page, recipe_id in ((1, first['_id']), (2, second['_id'])):
+        response = get_all_recipes(client, auth_headers, page=page, per_page=1)
+
+        with client.application.test_request_context():
+            expected = jsonify({
+                'results': [Recipe.objects(_id=recipe_id).get().to_mongo()],
+                'pages': 2,
+                'total': 2
+            })
+
+        assert response.status_code == 200 and response.data == expected.data
+
+def test_page_past_the_end(client: FlaskClient, auth_headers):
+  # Only the first page may be empty
+  response = get_all_recipes(client, auth_headers, page=1)
+  assert response.status_code == 200 and response.json['results'] == []
+
+  response = get_all_recipes(client, auth_headers, page=5)
+  assert response.status_code == 404 and response.json['error'] == 'NOT_FOUND'
+
+  create_recipe(client, {'name': 'Pasta'}, auth_headers)
+
+  assert get_all_recipes(client, auth_headers, page=1, per_page=1).status_code == 200
+  assert get_all_recipes(client, auth_headers, page=2, per_page=1).status_code == 404
+
+  response = client.get('/api/v1/recipes?page=2&per_page=1&stream=true', headers=auth_headers)
+  assert response.status_code == 404
+
+def test_stream_list(client: FlaskClient, auth_headers):
+  for i in range(5):
+    create_recipe(client, {'name': 'Recipe {}'.format(i), 'tags': ['t{}'.format(i)]}, auth_headers)
+
+  batch_size = client.application.config.get('STREAM_BATCH_SIZE')
+  client.application.config['STREAM_BATCH_SIZE'] = 2
+
+  try:
+    for query in ('page=1&per_page=4', 'page=2&per_page=4', 'per_page=3&order_by=name&after=', 'per_page=10&fields=name&with_total=false'):
+      url = '/api/v1/recipes?' + query
+      expected = client.get(url, headers=auth_headers)
+      response = client.get(url + '&stream=true', headers=auth_headers)
+
+      assert response.status_code == 200 and response.is_streamed
+      assert response.mimetype == 'application/json'
+      assert response.data == expected.data
+
+    # Cursor of the next page is written after the results
+    response = client.get('/api/v1/recipes?per_page=3&order_by=name&after=&stream=true', headers=auth_headers)
+    assert [recipe['name'] for recipe in response.json['results']] == ['Recipe 0', 'Recipe 1', 'Recipe 2']
+
+    response = client.get('/api/v1/recipes?per_page=3&order_by=name&after={}&stream=true'.format(response.json['next']), headers=auth_headers)
+    assert [recipe['name'] for recipe in response.json['results']] == ['Recipe 3', 'Recipe 4'] and response.json['next'] is None
+
+    response = client.get('/api/v1/recipes?per_page=10&stream=true', headers=auth_headers, buffered=False)
+    assert len(list(response.response)) > 3
+  finally:
+    if batch_size is None:
+      del client.application.config['STREAM_BATCH_SIZE']
+    else:
+      client.application.config['STREAM_BATCH_SIZE'] = batch_size
+
+def test_expand_with_fields(client: FlaskClient, auth_headers):
+  tuna = create_ingredient(client, {'name': 'Tuna'}, auth_headers).json
+  recipe = create_recipe(client, {'name': 'Pasta', 'ingredients': [{'ingredient': tuna['_id'], 'quantity': 2}]}, auth_headers).json
+
+  response = client.get('/api/v1/recipes/{}?fields=name,ingredients&expand=ingredients'.format(recipe['_id']), headers=auth_headers)
+
+  assert response.status_code == 200 and response.json['ingredients'] == [{'ingredient': tuna, 'quantity': 2}]
+  assert 'preparation' not in response.json
+
+  # The stored recipe keeps its references
+  response = get_recipe(client, recipe['_id'], auth_headers)
+  assert response.json['ingredients'] == [{'ingredient': tuna['_id'], 'quantity': 2}]
+
+  response = patch_recipe(client, recipe['_id'], {'name': 'Tuna pasta'}, auth_headers)
+  assert response.status_code == 200 and response.json['ingredients'] == [{'ingredient': tuna['_id'], 'quantity': 2}]
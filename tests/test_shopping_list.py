@@ -7,6 +7,12 @@ from flask import jsonify
 from flask.json import dumps, loads
 from flask.testing import FlaskClient
 
+from bson import ObjectId
+from mongoengine.queryset import QuerySet
+
+from weekly_menu.webapp import api
+from weekly_menu.webapp.api.models import ShoppingList
+
 from test_ingredient import create_ingredient, delete_ingredient
 
 def create_shopping_list(client, json, auth_headers):
@@ -613,4 +619,129 @@ def test_get_last_updated(client: FlaskClient, auth_headers):
         and len(response.json['results']) == 1 \
         and response.json['results'][0]['_id'] == idx_2 \
         and response.json['results'][0]['update_timestamp'] == update_timestamp_2
-        
\ No newline at end of file
+        
+def test_conditional_get(client: FlaskClient, auth_headers):
+  shopping_list = create_shopping_list(client, {'name': 'list1', 'items': []}, auth_headers).json
+
+  response = get_shopping_list(client, shopping_list['_id'], auth_headers)
+  etag = response.headers['ETag']
+  last_modified = response.headers['Last-Modified']
+
+  assert response.status_code == 200 and etag.startswith('W/')
+
+  response = client.get('/api/v1/shopping-lists/{}'.format(shopping_list['_id']), headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 304 and response.data == b'' and response.headers['ETag'] == etag
+
+  response = client.get('/api/v1/shopping-lists/{}'.format(shopping_list['_id']), headers=dict(auth_headers, **{'If-Modified-Since': last_modified}))
+  assert response.status_code == 304
+
+  # Another representation of the same list
+  response = client.get('/api/v1/shopping-lists/{}?fields=name'.format(shopping_list['_id']), headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 200 and response.headers['ETag'] != etag
+
+  ShoppingList._get_collection().update_one({'_id': ObjectId(shopping_list['_id'])}, {'$inc': {'update_timestamp': 1}})
+
+  response = client.get('/api/v1/shopping-lists/{}'.format(shopping_list['_id']), headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 200 and response.json['name'] == 'list1' and response.headers['ETag'] != etag
+
+  response = client.get('/api/v1/shopping-lists/{}'.format(ObjectId()), headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 404 and 'ETag' not in response.headers
+
+def test_conditional_list(client: FlaskClient, auth_headers):
+  first = create_shopping_list(client, {'name': 'list1', 'items': []}, auth_headers).json
+
+  response = get_all_shopping_list(client, auth_headers)
+  etag = response.headers['ETag']
+
+  response = client.get('/api/v1/shopping-lists?page=1&per_page=10&order_by=&desc=False', headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 304 and response.data == b''
+
+  response = client.get('/api/v1/shopping-lists?page=1&per_page=5&order_by=&desc=False', headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 200
+
+  # Inserts and deletes change the list validators
+  second = create_shopping_list(client, {'name': 'list2', 'items': []}, auth_headers).json
+
+  response = client.get('/api/v1/shopping-lists?page=1&per_page=10&order_by=&desc=False', headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 200 and response.json['total'] == 2
+  etag = response.headers['ETag']
+
+  client.delete('/api/v1/shopping-lists/{}'.format(first['_id']), headers=auth_headers)
+
+  response = client.get('/api/v1/shopping-lists?page=1&per_page=10&order_by=&desc=False', headers=dict(auth_headers, **{'If-None-Match': etag}))
+  assert response.status_code == 200 and response.json['total'] == 1
+
+def test_list_validators_without_count(client: FlaskClient, auth_headers, monkeypatch):
+  create_shopping_list(client, {'name': 'list1', 'items': []}, auth_headers)
+
+  counts = []
+  count = QuerySet.count
+  monkeypatch.setattr(QuerySet, 'count', lambda self, *args, **kwargs: counts.append(self._document) or count(self, *args, **kwargs))
+
+  # Clients not asking for the total don't pay for a count, conditional or not
+  for query in ('with_total=false', 'after='):
+    response = client.get('/api/v1/shopping-lists?' + query, headers=auth_headers)
+    assert response.status_code == 200 and 'ETag' in response.headers
+
+    response = client.get('/api/v1/shopping-lists?' + query, headers=dict(auth_headers, **{'If-None-Match': response.headers['ETag']}))
+    assert response.status_code == 304
+
+  assert counts == []
+
+def test_item_writes_update_timestamp(client: FlaskClient, auth_headers, monkeypatch):
+  ham = create_ingredient(client, {'name': 'ham'}, auth_headers).json
+  tuna = create_ingredient(client, {'name': 'tuna'}, auth_headers).json
+
+  shop_list = create_shopping_list(client, {'name': 'list1', 'items': [{'item': ham['_id'], 'checked': False}]}, auth_headers).json
+  update_timestamp = shop_list['update_timestamp']
+  etag = get_shopping_list(client, shop_list['_id'], auth_headers).headers['ETag']
+
+  # Every write falls in the same millisecond of the creation
+  monkeypatch.setattr(api, 'current_timestamp', lambda: shop_list['update_timestamp'])
+
+  def assert_updated():
+    nonlocal update_timestamp, etag
+    response = client.get('/api/v1/shopping-lists/{}'.format(shop_list['_id']), headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200 and response.json['update_timestamp'] > update_timestamp
+    update_timestamp = response.json['update_timestamp']
+    etag = response.headers['ETag']
+
+  assert add_item_in_shopping_list(client, shop_list['_id'], {'item': tuna['_id'], 'checked': False}, auth_headers).status_code == 201
+  assert_updated()
+
+  assert update_item_in_shopping_list(client, shop_list['_id'], tuna['_id'], {'checked': True}, auth_headers).status_code == 200
+  assert_updated()
+
+  assert patch_shopping_list(client, shop_list['_id'], {'name': 'list2'}, auth_headers).status_code == 200
+  assert_updated()
+
+  assert replace_item_in_shopping_list(client, shop_list['_id'], tuna['_id'], {'item': tuna['_id'], 'checked': False}, auth_headers).status_code == 200
+  assert_updated()
+
+  assert delete_item_in_shopping_list(client, shop_list['_id'], tuna['_id'], auth_headers).status_code == 204
+  assert_updated()
+
+  # Removing an ingredient pulls it from the lists
+  assert delete_ingredient(client, ham['_id'], auth_headers).status_code == 204
+  assert_updated()
+
+  assert get_shopping_list(client, shop_list['_id'], auth_headers).json['items'] == []
+
+def test_expand_items(client: FlaskClient, auth_headers):
+  ham = create_ingredient(client, {'name': 'ham'}, auth_headers).json
+  tuna = create_ingredient(client, {'name': 'tuna'}, auth_headers).json
+
+  shop_list = create_shopping_list(client, {'name': 'list1', 'items': [
+    {'item': ham['_id'], 'checked': False},
+    {'item': tuna['_id'], 'checked': True}
+  ]}, auth_headers).json
+
+  response = client.get('/api/v1/shopping-lists/{}?expand=items'.format(shop_list['_id']), headers=auth_headers)
+
+  assert response.status_code == 200
+  assert [(item['item']['name'], item['checked']) for item in response.json['items']] == [('ham', False), ('tuna', True)]
+
+  response = client.get('/api/v1/shopping-lists?expand=items', headers=auth_headers)
+
+  assert response.status_code == 200
+  assert [item['item']['_id'] for item in response.json['results'][0]['items']] == [ham['_id'], tuna['_id']]
@@ -9,6 +9,7 @@ from mongoengine.errors import ValidationError
 from datetime import datetime, date
 
 from .api.exceptions import BaseRESTException
+from .api.serialization import msgpack, MSGPACK_MIMETYPE
 
 _logger = logging.getLogger(__name__)
 
@@ -44,11 +45,16 @@ def create_app(object_name):
 
     create_api_module(app)
 
+    from .compression import compression
+
+    compression.init_app(app)
+
     return app
 
 @app.before_request
 def before_request():
-    if ((request.data != b'') and (not request.is_json)):
+    is_msgpack = msgpack is not None and request.mimetype == MSGPACK_MIMETYPE
+    if ((request.data != b'') and (not request.is_json) and (not is_msgpack)):
         return jsonify({'msg': 'payload does not contains json data'}), 400
 
 @app.errorhandler(Exception)
@@ -70,7 +76,7 @@ def handle_rest_exception(e: BaseRESTException):
             'error': e.error,
             'descritpion': e.description,
             'details': e.details
-    }), e.code
+    }), e.code, e.headers
 
 @app.errorhandler(NotFound)
 def handle_notfound(e):
@@ -2,15 +2,25 @@ import re
 
 from datetime import datetime
 from functools import wraps
-from flask import request, jsonify, make_response
+from flask import current_app, request, jsonify, make_response, after_this_request
 from json import dumps
 from marshmallow_mongoengine import ModelSchema
-from flask_restful import Api, reqparse
+from flask_restful import Api, reqparse, inputs
 from flask_mongoengine import MongoEngine, DoesNotExist
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import get_jwt_identity, get_jwt_claims
+from mongoengine.base import BaseDocument
 from mongoengine.queryset.visitor import Q
 from mongoengine.errors import ValidationError
-
+from bson import ObjectId, DBRef
+from werkzeug.wrappers import Response as ResponseBase
+
+from .cache import LRUCache
+from .search import SearchIndex, get_search_weights
+from .filters import CompiledFilters
+from .expansion import parse_expand, expand
+from .conditional import get_document_validators, get_list_validators, bump_list_version
+from .serialization import json_response, stream_response, msgpack_response, loads_msgpack, to_serializable, msgpack, MSGPACK_MIMETYPE
+from .pagination import ID_FIELD, paginate_by_offset, paginate_by_cursor
 from .exceptions import InvalidPayloadSupplied, BadRequest, Forbidden
 
 # Constant fields
@@ -18,26 +28,94 @@ from .exceptions import InvalidPayloadSupplied, BadRequest, Forbidden
 API_PREFIX = '/api'
 
 class QueryArgs:
+    Q = 'q'
     DAY = 'day'
+    OF = 'of'
+    FROM = 'from'
+    TO = 'to'
+    FILTERS = 'filters'
+    FIELDS = 'fields'
+    EXPAND = 'expand'
     ORDER_BY = 'order_by'
     DESC = 'desc'
 
 # Pagination
 DEFAULT_PAGE_SIZE = 10
+DEFAULT_STREAM_BATCH_SIZE = 500
+
+# Date query parameters (YYYY-MM-DD)
+DAY_REGEX = re.compile('^([0-9]{4})-([0-1][0-9])-([0-3][0-9])$')
+
+# Principal cache
+DEFAULT_PRINCIPAL_CACHE_SIZE = 1024
+DEFAULT_PRINCIPAL_CACHE_TTL = 300
+
+# Count cache
+DEFAULT_COUNT_CACHE_SIZE = 4096
+DEFAULT_COUNT_CACHE_TTL = 60
+
+# Tag cache
+DEFAULT_TAG_CACHE_SIZE = 1024
+DEFAULT_TAG_CACHE_TTL = 300
+
+class WriteOp:
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+def current_timestamp() -> int:
+    # Milliseconds since epoch, as stored in insert_timestamp and update_timestamp
+    return int(datetime.utcnow().timestamp()*1000)
 
 api = Api()
 
 mongo = MongoEngine()
 
+# Users resolved from JWT identity, shared by every request served by this worker
+principal_cache = LRUCache()
+
+# Number of documents of each owner, by (collection, owner id)
+count_cache = LRUCache()
+
+# Tags of each owner with their number of documents, by (collection, owner id)
+tag_cache = LRUCache()
+
+# Full-text search on recipes and ingredients
+search_index = SearchIndex()
+
+_write_listeners = []
+
+# Sortable fields of each model, see get_sortable_fields
+_sortable_fields = {}
+
 
 def create_module(app):
 
     mongo.init_app(app)
 
+    principal_cache.configure(
+        app.config.get('PRINCIPAL_CACHE_SIZE', DEFAULT_PRINCIPAL_CACHE_SIZE),
+        app.config.get('PRINCIPAL_CACHE_TTL', DEFAULT_PRINCIPAL_CACHE_TTL)
+    )
+    count_cache.configure(
+        app.config.get('COUNT_CACHE_SIZE', DEFAULT_COUNT_CACHE_SIZE),
+        app.config.get('COUNT_CACHE_TTL', DEFAULT_COUNT_CACHE_TTL)
+    )
+
+    tag_cache.configure(
+        app.config.get('TAG_CACHE_SIZE', DEFAULT_TAG_CACHE_SIZE),
+        app.config.get('TAG_CACHE_TTL', DEFAULT_TAG_CACHE_TTL)
+    )
+    search_index.init_app(app)
+
     from .v1 import create_module as create_api_v1
 
     create_api_v1(app, api)
 
+    from .indexes import check_indexes
+
+    check_indexes(app)
+
     # Using workaround from here to handle inherit exception handling from flask: https://github.com/flask-restful/flask-restful/issues/280#issuecomment-280648790
     handle_exceptions = app.handle_exception
     handle_user_exception = app.handle_user_exception
@@ -59,11 +137,57 @@ def output_json(data, code, headers=None):
     return resp
 
 
+def _to_mongo(data):
+    # Documents and embedded documents, also in lists, as the JSON encoder turns them
+    if isinstance(data, BaseDocument):
+        return data.to_mongo()
+    if isinstance(data, (list, tuple)):
+        return [_to_mongo(item) for item in data]
+
+    return data
+
+
+if msgpack is not None:
+    @api.representation(MSGPACK_MIMETYPE)
+    def output_msgpack(data, code, headers=None):
+        data = _to_mongo(data)
+
+        resp = msgpack_response(data, code)
+        resp.headers.extend(headers or {})
+        return resp
+
+
+def get_mediatype() -> str:
+    """
+        Representation chosen for the current request, negotiated as flask_restful does.
+    """
+    for mediatype in api.mediatypes():
+        if mediatype in api.representations:
+            return mediatype
+
+    return api.default_mediatype
+
+
+def get_request_payload(silent=False):
+    """
+        Decoded request body, sent either as JSON or as msgpack.
+    """
+    if msgpack is not None and request.mimetype == MSGPACK_MIMETYPE:
+        try:
+            return loads_msgpack(request.get_data())
+        except ValueError as ex:
+            if silent:
+                return None
+            raise InvalidPayloadSupplied('invalid msgpack payload supplied', [str(ex)])
+
+    return request.get_json(silent=silent)
+
+
 def validate_payload(model_schema: ModelSchema, kwname='payload'):
     def decorate(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            data, errors = model_schema.load(request.get_json())
+            data, errors = model_schema.load(get_request_payload())
 
             if len(errors) != 0:
                 raise InvalidPayloadSupplied(
@@ -85,6 +209,35 @@ def parse_query_args(func):
         required=False,
         default=None
     )
+    query_args_reqparse.add_argument(
+        QueryArgs.FIELDS,
+        type=str,
+        location=['args'],
+        required=False,
+        default=None
+    )
+    query_args_reqparse.add_argument(
+        QueryArgs.EXPAND,
+        type=str,
+        location=['args'],
+        required=False,
+        default=None
+    )
+    query_args_reqparse.add_argument(
+        QueryArgs.Q,
+        type=str,
+        location=['args'],
+        required=False,
+        default=None
+    )
+    for date_arg in (QueryArgs.OF, QueryArgs.FROM, QueryArgs.TO):
+        query_args_reqparse.add_argument(
+            date_arg,
+            type=str,
+            location=['args'],
+            required=False,
+            default=None
+        )
     query_args_reqparse.add_argument(
         QueryArgs.ORDER_BY,
         type=str,
@@ -94,7 +247,7 @@ def parse_query_args(func):
     )
     query_args_reqparse.add_argument(
         QueryArgs.DESC,
-        type=bool,
+        type=inputs.boolean,
         location=['args'],
         required=False,
         default=False
@@ -104,7 +257,13 @@ def parse_query_args(func):
         query_args = query_args_reqparse.parse_args()
 
         kwargs['query_args'] = {
-            QueryArgs.DAY: query_args[QueryArgs.DAY],
+            QueryArgs.Q: query_args[QueryArgs.Q],
+            QueryArgs.FIELDS: query_args[QueryArgs.FIELDS],
+            QueryArgs.EXPAND: query_args[QueryArgs.EXPAND],
+            # 'of' is an alias of 'day'
+            QueryArgs.DAY: query_args[QueryArgs.DAY] or query_args[QueryArgs.OF],
+            QueryArgs.FROM: query_args[QueryArgs.FROM],
+            QueryArgs.TO: query_args[QueryArgs.TO],
             QueryArgs.ORDER_BY: query_args[QueryArgs.ORDER_BY],
             QueryArgs.DESC: query_args[QueryArgs.DESC],
 
@@ -114,12 +273,70 @@ def parse_query_args(func):
     return wrapper
 
 
+def filtered(coll_class: mongo.Document.__class__):
+    """
+        Parse the filters declared in the FILTERS of the model into query_args. Must
+        be applied after parse_query_args.
+    """
+    compiled_filters = CompiledFilters(coll_class)
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            kwargs['query_args'][QueryArgs.FILTERS] = compiled_filters.build_query(request.args)
+
+            return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def conditional(coll_class: mongo.Document.__class__, id_arg=None):
+    """
+        Conditional GET of the document identified by the 'id_arg' parameter, or of
+        the owner's whole collection if it's None: ETag and Last-Modified headers are
+        sent and 304 is answered without loading the documents when the client
+        copy is still valid. Must be applied after load_user_info.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            owner_id = kwargs['user_info'].id
+
+            # Expanded documents also change with the referenced ones
+            if request.args.get(QueryArgs.EXPAND):
+                return func(*args, **kwargs)
+
+            # Each representation has its own validators
+            if id_arg is None:
+                validators = get_list_validators(coll_class, owner_id, get_mediatype())
+            else:
+                validators = get_document_validators(coll_class, owner_id, kwargs[id_arg], get_mediatype())
+
+            # Missing documents are left to the resource
+            if validators is None:
+                return func(*args, **kwargs)
+
+            if validators.is_not_modified():
+                return validators.not_modified()
+
+            @after_this_request
+            def set_validators(response):
+                if response.status_code == 200:
+                    validators.set_headers(response)
+                return response
+
+            return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
 
 def get_payload(kwname='payload'):
     def decorate(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            data = request.get_json()
+            data = get_request_payload()
 
             kwargs[kwname] = data
 
@@ -129,15 +346,71 @@ def get_payload(kwname='payload'):
     return decorate
 
 
-def load_user_info(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        from .models import User
+class UserClaims:
+    ID = 'id'
+    VERSION = 'ver'
+
+
+def get_user_claims(user) -> dict:
+    return {
+        UserClaims.ID: str(user.id),
+        UserClaims.VERSION: user.version or 0
+    }
+
+
+def resolve_user(identity, version=None):
+    from .models import User
+
+    user = principal_cache.get(identity)
+
+    if user is None:
         try:
-            user = User.objects(Q(email=get_jwt_identity())).get()
+            user = User.objects(Q(email=identity)).get()
         except DoesNotExist:
             raise Forbidden()
 
+        principal_cache.set(identity, user)
+
+    if version is not None and version != (user.version or 0):
+        raise Forbidden()
+
+    return user
+
+
+class UserPrincipal:
+    """
+        Authenticated user as described by the token claims. The 'id' is available
+        without touching the database, any other attribute loads the whole User.
+    """
+
+    def __init__(self, identity, user_id, version):
+        self.id = user_id
+        self._identity = identity
+        self._version = version
+        self._user = None
+
+    def __getattr__(self, name):
+        if self._user is None:
+            self._user = resolve_user(self._identity, self._version)
+
+        return getattr(self._user, name)
+
+    def __repr__(self):
+        return "<UserPrincipal '{}'>".format(self.id)
+
+
+def load_user_info(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        identity = get_jwt_identity()
+        claims = get_jwt_claims()
+
+        if UserClaims.ID in claims:
+            user = UserPrincipal(identity, ObjectId(claims[UserClaims.ID]), claims.get(UserClaims.VERSION))
+        else:
+            # Tokens released before user claims were introduced
+            user = resolve_user(identity)
+
         kwargs['user_info'] = user
 
         return func(*args, **kwargs)
@@ -160,11 +433,38 @@ def paginated(func):
         required=False,
         default=DEFAULT_PAGE_SIZE
     )
+    pagination_reqparse.add_argument(
+        'after',
+        type=str,
+        location=['args'],
+        required=False,
+        default=None
+    )
+    pagination_reqparse.add_argument(
+        'with_total',
+        type=inputs.boolean,
+        location=['args'],
+        required=False,
+        default=None
+    )
+    pagination_reqparse.add_argument(
+        'stream',
+        type=inputs.boolean,
+        location=['args'],
+        required=False,
+        default=False
+    )
     @wraps(func)
     def wrapper(*args, **kwargs):
         page_args = pagination_reqparse.parse_args()
         page = page_args['page']
         per_page = page_args['per_page']
+        after = page_args['after']
+        with_total = page_args['with_total']
+
+        # Cursor clients don't need the total, page based ones always got it
+        if with_total is None:
+            with_total = after is None
 
         if page <= 0:
             raise BadRequest('page argument must be greater than zero')
@@ -172,21 +472,110 @@ def paginated(func):
         if per_page <= 0:
             raise BadRequest('per_page argument must be greater than zero')
 
+        # Streamed pages are read from the database in batches
+        batch_size = None
+        if page_args['stream']:
+            batch_size = current_app.config.get('STREAM_BATCH_SIZE', DEFAULT_STREAM_BATCH_SIZE)
+
         kwargs['page_args'] = {
             'page': page,
-            'per_page': per_page
+            'per_page': per_page,
+            'after': after,
+            'with_total': with_total,
+            'batch_size': batch_size
         }
 
         page = func(*args, **kwargs)
 
-        return jsonify({
+        # Not modified (see conditional)
+        if isinstance(page, ResponseBase):
+            return page
+
+        mediatype = get_mediatype()
+
+        # msgpack arrays need their length up front, those pages are not streamed
+        if batch_size is not None and mediatype != MSGPACK_MIMETYPE:
+            return stream_response(page, after is not None, batch_size)
+
+        response = {
             #"results": page.items,
-            "results": [item.to_mongo() if isinstance(item, mongo.Document) else item for item in page.items],
-            "pages": page.pages
-        })
+            "results": [item.to_mongo() if isinstance(item, mongo.Document) else item for item in page.items]
+        }
+
+        if page.total is not None:
+            response['pages'] = page.pages
+            response['total'] = page.total
+
+        if after is not None:
+            response['next'] = page.next
+
+        if mediatype == MSGPACK_MIMETYPE:
+            return msgpack_response(response)
+
+        return json_response(response)
 
     return wrapper
 
+def on_write(listener):
+    """
+        Register a function called as listener(op, coll_class, owner_id, document) after
+        every write made through the helpers below.
+    """
+    _write_listeners.append(listener)
+    return listener
+
+def notify_write(op: str, coll_class: mongo.Document.__class__, owner_id, document=None):
+    # The document is None when documents are updated without being loaded
+    for listener in _write_listeners:
+        listener(op, coll_class, owner_id, document)
+
+def _get_owner_id(document: mongo.Document):
+    # Don't go through the ReferenceField, it would fetch the owner
+    owner = document._data.get('owner')
+    if isinstance(owner, DBRef):
+        return owner.id
+    return getattr(owner, 'pk', owner)
+
+def create_document(document: mongo.Document):
+    document.save()
+    notify_write(WriteOp.INSERT, document.__class__, _get_owner_id(document), document)
+    return document
+
+def delete_document(document: mongo.Document):
+    document.delete()
+    notify_write(WriteOp.DELETE, document.__class__, _get_owner_id(document), document)
+
+def _next_timestamp(timestamp) -> int:
+    # Strictly increasing, so writes in the same millisecond still change the ETag
+    return max(current_timestamp(), (timestamp or 0) + 1)
+
+def save_document(document: mongo.Document):
+    """
+        Save a loaded document changed in place (e.g. in its embedded documents).
+    """
+    document.update_timestamp = _next_timestamp(document.update_timestamp)
+    document.save()
+    notify_write(WriteOp.UPDATE, document.__class__, _get_owner_id(document), document)
+    return document
+
+def update_documents(queryset, **update) -> int:
+    """
+        Update (with mongoengine's syntax) every owner's document matched by the queryset
+        with a single query, without loading them. Returns the number of updated documents.
+    """
+    latest = queryset.order_by('-update_timestamp').only('update_timestamp').as_pymongo().first()
+
+    if latest is None:
+        return 0
+
+    # Past the most recent of the matched documents, so each of them gets a new ETag
+    count = queryset.update(set__update_timestamp=_next_timestamp(latest.get('update_timestamp')), **update)
+
+    if count > 0:
+        notify_write(WriteOp.UPDATE, queryset._document, queryset._query['owner'])
+
+    return count
+
 def _update_embedded_document(new_doc: mongo.EmbeddedDocument, old_doc: mongo.EmbeddedDocument, patch=True):
     if patch == True:
         for field in new_doc.__class__._fields:
@@ -201,14 +590,19 @@ def _update_document(coll_class: mongo.Document.__class__, new_doc: mongo.Docume
     new_doc._id = old_doc._id
     new_doc.owner = old_doc.owner
     new_doc.insert_timestamp = old_doc.insert_timestamp
+    new_doc.update_timestamp = _next_timestamp(old_doc.update_timestamp)
 
     if patch == True:
-        return coll_class._get_collection().update(
+        result = coll_class._get_collection().update(
             {'_id': old_doc.id}, {'$set': new_doc.to_mongo()})
     else:
-        return coll_class._get_collection().update(
+        result = coll_class._get_collection().update(
             {'_id': old_doc.id}, new_doc.to_mongo())
 
+    notify_write(WriteOp.UPDATE, coll_class, _get_owner_id(old_doc), new_doc)
+
+    return result
+
 
 def put_document(coll_class: mongo.Document.__class__, new_doc: mongo.Document, old_doc: mongo.Document):
     return _update_document(coll_class, new_doc, old_doc, patch=False)
@@ -224,37 +618,206 @@ def patch_embedded_document(new_doc: mongo.EmbeddedDocument, old_doc: mongo.Embe
     return _update_embedded_document(new_doc, old_doc, patch=True)
 
 
+def apply_fields(queryset, fields_arg: str, *required):
+    """
+        Load only the fields listed in a comma separated 'fields' parameter (plus _id and
+        'required'). Documents are then returned as plain dicts, so excluded fields are
+        neither sent by the database nor serialized.
+    """
+    if not fields_arg:
+        return queryset
+
+    coll_class = queryset._document
+    fields = [field.strip() for field in fields_arg.split(',') if field.strip() != '']
+    unknown = [field for field in fields if field not in coll_class._fields]
+
+    if unknown:
+        raise BadRequest('unknown fields: {}'.format(', '.join(unknown)), sorted(coll_class._fields))
+
+    return queryset.only(ID_FIELD, *fields, *required).as_pymongo()
+
+def expand_document(coll_class: mongo.Document.__class__, document, expand_arg: str, owner_id):
+    """
+        Document (or raw dict, see apply_fields) with the references listed in a comma
+        separated 'expand' parameter replaced by the referenced documents.
+    """
+    names = parse_expand(coll_class, expand_arg)
+
+    if not names:
+        return document
+
+    # expand() rewrites the references in place: raw dicts are copied, not to touch
+    # the query results
+    if isinstance(document, mongo.Document):
+        document = document.to_mongo()
+    else:
+        document = to_serializable(coll_class, document)
+
+    return expand(coll_class, [document], names, owner_id)[0]
+
+def parse_day(value: str, name=QueryArgs.DAY) -> datetime:
+    match = DAY_REGEX.match(value)
+
+    if match is None:
+        raise BadRequest('invalid {} format'.format(name))
+
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError as ex:
+        raise BadRequest('invalid {} parameter supplied: {}'.format(name, ex))
+
 def _build_query_by_params(base_query, query_args):
-    if QueryArgs.DAY in query_args and query_args[QueryArgs.DAY] is not None:
-        if bool(re.search('^[0-9]{4}-[0-1][0-9]-[0-3][0-9]$', query_args[QueryArgs.DAY])):
-            try:
-                searched_day = datetime.strptime(query_args[QueryArgs.DAY], '%Y-%m-%d')
-            except ValueError as ex:
-                raise BadRequest('invalid day parameter supplied: {}'.format(ex))
-        else:
-            raise BadRequest('invalid day format')
-        
-        base_query = base_query & Q(date=searched_day)
-    
+    if query_args.get(QueryArgs.FILTERS) is not None:
+        base_query = base_query & query_args[QueryArgs.FILTERS]
+
+    if query_args.get(QueryArgs.DAY) is not None:
+        base_query = base_query & Q(date=parse_day(query_args[QueryArgs.DAY]))
+
+    # Inclusive range, served by the (owner, date) index. Empty bounds are ignored
+    from_day = parse_day(query_args[QueryArgs.FROM], QueryArgs.FROM) if query_args.get(QueryArgs.FROM) else None
+    to_day = parse_day(query_args[QueryArgs.TO], QueryArgs.TO) if query_args.get(QueryArgs.TO) else None
+
+    if from_day is not None and to_day is not None and from_day > to_day:
+        raise BadRequest('from must not be after to')
+
+    if from_day is not None:
+        base_query = base_query & Q(date__gte=from_day)
+
+    if to_day is not None:
+        base_query = base_query & Q(date__lte=to_day)
+
     return base_query
 
-def _apply_ordering(filtered_objects, query_args):
-    if(query_args[QueryArgs.ORDER_BY] != None and query_args[QueryArgs.ORDER_BY] != ''):
-        if(query_args[QueryArgs.DESC] == True):
-            filtered_objects = filtered_objects.order_by('-' + query_args[QueryArgs.ORDER_BY]) # descending "-"
-        else:
-            filtered_objects = filtered_objects.order_by('+' + query_args[QueryArgs.ORDER_BY]) # ascending "+"
+def get_sortable_fields(coll_class: mongo.Document.__class__) -> list:
+    """
+        Fields backed by an (owner, <field>, _id) index: sorting on them, with _id
+        as tiebreaker, walks the index instead of sorting documents in memory.
+    """
+    fields = _sortable_fields.get(coll_class)
+
+    if fields is None:
+        fields = [ID_FIELD]
+        for spec in coll_class._meta['index_specs']:
+            keys = [key for key, _ in spec['fields']]
+            if len(keys) == 3 and keys[0] == 'owner' and keys[2] == ID_FIELD:
+                fields.append(keys[1])
+        _sortable_fields[coll_class] = fields
+
+    return fields
+
+def _get_sort_field(coll_class: mongo.Document.__class__, query_args):
+    field = query_args[QueryArgs.ORDER_BY] or ID_FIELD
+    sortable = get_sortable_fields(coll_class)
+
+    if field not in sortable:
+        raise BadRequest('can\'t order by {}'.format(field), sortable)
+
+    return field
+
+def _apply_ordering(filtered_objects, field, desc):
+    sign = '-' if desc == True else '+' # descending "-", ascending "+"
 
-    return filtered_objects 
+    if field == ID_FIELD:
+        return filtered_objects.order_by(sign + ID_FIELD)
 
-def _apply_pagination(ordered_objects, page_args):
-    return ordered_objects.paginate(page=page_args['page'], per_page=page_args['per_page'])
+    return filtered_objects.order_by(sign + field, sign + ID_FIELD)
+
+def _apply_pagination(ordered_objects, page_args, total=None):
+    return paginate_by_offset(ordered_objects, page_args['page'], page_args['per_page'], total, page_args.get('batch_size'))
+
+def _count(coll_class: mongo.Document.__class__, filtered_objects):
+    query = filtered_objects._query
+
+    # Only the whole collection of an owner is cached, other filters are counted every time
+    if list(query.keys()) != ['owner']:
+        return filtered_objects.count()
+
+    key = (coll_class._get_collection_name(), str(query['owner']))
+    count = count_cache.get(key)
+
+    if count is None:
+        count = filtered_objects.count()
+        count_cache.set(key, count)
+
+    return count
+
+@on_write
+def _update_list_version(op, coll_class, owner_id, document):
+    bump_list_version(coll_class, owner_id, current_timestamp())
+
+@on_write
+def _update_count_cache(op, coll_class, owner_id, document):
+    if op == WriteOp.INSERT:
+        count_cache.incr((coll_class._get_collection_name(), str(owner_id)), 1)
+    elif op == WriteOp.DELETE:
+        count_cache.incr((coll_class._get_collection_name(), str(owner_id)), -1)
+
+def get_tag_counts(coll_class: mongo.Document.__class__, owner_id) -> list:
+    """
+        Tags used in the owner's documents, with the number of documents using them,
+        most used first.
+    """
+    key = (coll_class._get_collection_name(), str(owner_id))
+    tags = tag_cache.get(key)
+
+    if tags is None:
+        tags = [{'tag': facet['_id'], 'count': facet['count']} for facet in coll_class._get_collection().aggregate([
+            {'$match': {'owner': ObjectId(owner_id), 'tags': {'$ne': None}}},
+            {'$unwind': '$tags'},
+            {'$group': {'_id': '$tags', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}}
+        ])]
+        tag_cache.set(key, tags)
+
+    return tags
+
+@on_write
+def _update_tag_cache(op, coll_class, owner_id, document):
+    tag_cache.invalidate((coll_class._get_collection_name(), str(owner_id)))
+
+@on_write
+def _update_search_index(op, coll_class, owner_id, document):
+    search_index.invalidate(coll_class, owner_id)
 
 def search_on_model(coll_class: mongo.Document.__class__, base_query, query_args, page_args):
     query_filter = _build_query_by_params(base_query, query_args)
+    sort_field = _get_sort_field(coll_class, query_args)
+    expand_names = parse_expand(coll_class, query_args.get(QueryArgs.EXPAND))
 
     filtered_objects = coll_class.objects(query_filter)
-    ordered_objects = _apply_ordering(filtered_objects, query_args)
-    paginated_objects = _apply_pagination(ordered_objects, page_args)
+
+    search = query_args.get(QueryArgs.Q)
+    if search:
+        if not get_search_weights(coll_class):
+            raise BadRequest('search is not supported on this resource')
+
+        filtered_objects = search_index.filter(filtered_objects, filtered_objects._query['owner'], search)
+
+    total = _count(coll_class, filtered_objects) if page_args.get('with_total', True) else None
+
+    # The cursor of the next page is built from the sort field
+    filtered_objects = apply_fields(filtered_objects, query_args.get(QueryArgs.FIELDS), sort_field)
+
+    # Documents are read as raw dicts, skipping the Document hydration
+    filtered_objects = filtered_objects.as_pymongo()
+
+    # An 'after' cursor (even an empty one, for the first page) selects keyset pagination
+    if page_args.get('after') is not None:
+        paginated_objects = paginate_by_cursor(filtered_objects, sort_field, query_args[QueryArgs.DESC], page_args['after'], page_args['per_page'], total, page_args.get('batch_size'))
+
+    # Search results are sorted by relevance, unless an ordering is requested
+    elif search and not query_args[QueryArgs.ORDER_BY]:
+        paginated_objects = search_index.paginate_by_relevance(filtered_objects, filtered_objects._query['owner'], search, page_args['page'], page_args['per_page'], total, page_args.get('batch_size'))
+
+    else:
+        ordered_objects = _apply_ordering(filtered_objects, sort_field, query_args[QueryArgs.DESC])
+        paginated_objects = _apply_pagination(ordered_objects, page_args, total)
+
+    # Converted while the items are read, they may be streamed
+    paginated_objects.items = (to_serializable(coll_class, item) for item in paginated_objects.items)
+
+    # References of the whole page are resolved together
+    if expand_names:
+        paginated_objects.items = expand(coll_class, list(paginated_objects.items), expand_names, filtered_objects._query['owner'])
 
     return paginated_objects
\ No newline at end of file
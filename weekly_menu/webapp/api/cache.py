@@ -0,0 +1,82 @@
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+class LRUCache:
+    """
+        Per-process key/value cache with LRU eviction and an optional TTL (in seconds).
+        A max_size of 0 disables the cache: every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.configure(max_size, ttl)
+
+    def configure(self, max_size, ttl=None):
+        with self._lock:
+            self.max_size = int(max_size)
+            self.ttl = float(ttl) if ttl else None
+            self._entries.clear()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            expires_at = monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def incr(self, key, delta=1):
+        # Adjust a cached counter in place, absent (or expired) entries are left alone
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0] + delta, entry[1])
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._entries.items() if predicate(k, v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+    def __len__(self):
+        return len(self._entries)
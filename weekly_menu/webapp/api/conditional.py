@@ -0,0 +1,94 @@
+import calendar
+import hashlib
+
+from datetime import datetime, timezone
+from flask import current_app, request
+
+from .pagination import ID_FIELD
+
+TIMESTAMP_FIELD = 'update_timestamp'
+
+def make_etag(*parts) -> str:
+    return hashlib.sha1('\x00'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class Validators:
+    """
+        ETag and last modification time (update_timestamp, in milliseconds) of a
+        response. ETags are weak: the same representation may be sent with
+        different encodings.
+    """
+
+    def __init__(self, etag: str, timestamp=None):
+        self.etag = etag
+        self.timestamp = timestamp
+
+    def is_not_modified(self) -> bool:
+        # If-Modified-Since is ignored when an If-None-Match is sent
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+
+        if request.if_modified_since is not None and self.timestamp is not None:
+            # Last-Modified has a resolution of one second
+            return self.timestamp // 1000 <= calendar.timegm(request.if_modified_since.utctimetuple())
+
+        return False
+
+    def set_headers(self, response):
+        response.set_etag(self.etag, weak=True)
+        # ETags depend on the negotiated representation
+        response.vary.add('Accept')
+
+        if self.timestamp is not None:
+            response.last_modified = datetime.fromtimestamp(self.timestamp / 1000, timezone.utc)
+
+        return response
+
+    def not_modified(self):
+        return self.set_headers(current_app.response_class(status=304))
+
+
+def get_document_validators(coll_class, owner_id, document_id, mediatype: str):
+    """
+        Validators of an owner's document, read from its update_timestamp only. None
+        if the document does not exist.
+    """
+    document = coll_class.objects(_id=document_id, owner=owner_id).only(TIMESTAMP_FIELD).as_pymongo().first()
+
+    if document is None:
+        return None
+
+    timestamp = document.get(TIMESTAMP_FIELD)
+
+    # The query string selects the fields returned
+    return Validators(make_etag(document[ID_FIELD], timestamp, request.query_string, mediatype), timestamp)
+
+
+def get_list_key(coll_class, owner_id) -> str:
+    return '{}:{}'.format(coll_class._get_collection_name(), owner_id)
+
+
+def bump_list_version(coll_class, owner_id, timestamp: int):
+    """
+        Change the validators of the owner's collection, called after each of its writes.
+    """
+    from .models import ListVersion
+
+    ListVersion.objects(key=get_list_key(coll_class, owner_id)).update_one(
+        inc__version=1, max__update_timestamp=timestamp, upsert=True)
+
+
+def get_list_validators(coll_class, owner_id, mediatype: str):
+    """
+        Validators of the owner's collection, read from the version incremented by
+        every write (see bump_list_version): a single lookup, neither the documents
+        are counted nor their timestamps compared. Shared by all the workers, so
+        writes and deletes of the others are seen too.
+    """
+    from .models import ListVersion
+
+    latest = ListVersion.objects(key=get_list_key(coll_class, owner_id)).as_pymongo().first() or {}
+    version = latest.get('version', 0)
+    timestamp = latest.get(TIMESTAMP_FIELD)
+
+    return Validators(make_etag(coll_class._get_collection_name(), owner_id, version, request.full_path, mediatype), timestamp)
@@ -3,6 +3,7 @@ class BaseRESTException(Exception):
     error = 'GENERIC'
     description = 'generic REST exception raised'
     details = []
+    headers = {}
 
     def __init__(self, code=500, error=None, description=None, details=None):
         if code != None:
@@ -63,4 +64,16 @@ class CannotSetResourceId(BaseRESTException):
 
 class CannotSetOrChangeCreationUpdateTime(BaseRESTException):
     def __init__(self, description=None):
-        super().__init__(403, 'CANNOT_SET_CREATION_UPDATE_TIME', description)
\ No newline at end of file
+        super().__init__(403, 'CANNOT_SET_CREATION_UPDATE_TIME', description)
+
+class TooManyRequests(BaseRESTException):
+    def __init__(self, description=None, retry_after=None):
+        super().__init__(429, 'TOO_MANY_REQUESTS', description)
+        if retry_after != None:
+            self.headers = {'Retry-After': str(retry_after)}
+
+class ServiceUnavailable(BaseRESTException):
+    def __init__(self, description=None, retry_after=None):
+        super().__init__(503, 'SERVICE_UNAVAILABLE', description)
+        if retry_after != None:
+            self.headers = {'Retry-After': str(retry_after)}
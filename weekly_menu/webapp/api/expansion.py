@@ -0,0 +1,77 @@
+from .exceptions import BadRequest
+from .serialization import to_serializable
+
+class ExpandSpec:
+    """
+        A list of references, or of embedded documents holding a reference in
+        'field', that can be replaced with the referenced documents.
+    """
+
+    def __init__(self, list_field: str, field=None):
+        self.list_field = list_field
+        self.field = field
+
+
+def get_expansions(coll_class) -> dict:
+    return getattr(coll_class, 'EXPANSIONS', None) or {}
+
+
+def parse_expand(coll_class, expand_arg) -> list:
+    """
+        Expansions listed in a comma separated 'expand' parameter.
+    """
+    if not expand_arg:
+        return []
+
+    expansions = get_expansions(coll_class)
+    names = [name.strip() for name in expand_arg.split(',') if name.strip() != '']
+    unknown = [name for name in names if name not in expansions]
+
+    if unknown:
+        raise BadRequest('can\'t expand {}'.format(', '.join(unknown)), sorted(expansions))
+
+    return names
+
+
+def _get_referenced_class(coll_class, spec: ExpandSpec):
+    field = coll_class._fields[spec.list_field].field
+
+    if spec.field is not None:
+        field = field.document_type._fields[spec.field]
+
+    return field.document_type
+
+
+def expand(coll_class, documents: list, names: list, owner_id) -> list:
+    """
+        Replace, in place, the references of serialized documents (see to_serializable)
+        with the owner's referenced documents. The references of all the documents are
+        resolved together, with a single query for each expansion.
+    """
+    for name in names:
+        spec = get_expansions(coll_class)[name]
+        referenced_class = _get_referenced_class(coll_class, spec)
+
+        # (container, key) of every reference
+        slots = []
+        for document in documents:
+            references = document.get(spec.list_field) or []
+
+            for index, element in enumerate(references):
+                if spec.field is None:
+                    slots.append((references, index))
+                elif element.get(spec.field) is not None:
+                    slots.append((element, spec.field))
+
+        if not slots:
+            continue
+
+        ids = list({container[key] for container, key in slots})
+        referenced = {raw['_id']: to_serializable(referenced_class, raw)
+                      for raw in referenced_class.objects(owner=owner_id, _id__in=ids).as_pymongo()}
+
+        # References to missing documents are left as they are
+        for container, key in slots:
+            container[key] = referenced.get(container[key], container[key])
+
+    return documents
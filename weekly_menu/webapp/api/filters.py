@@ -0,0 +1,83 @@
+from mongoengine.queryset.visitor import Q
+
+from .exceptions import BadRequest
+
+# Operators are appended to the field name, as in 'rating__gte=2'. Without one
+# the filter is an equality (on list fields: the list contains the value)
+OP_SEPARATOR = '__'
+
+class FilterOp:
+    EQ = 'eq'
+    IN = 'in'
+    ALL = 'all'
+    LT = 'lt'
+    LTE = 'lte'
+    GT = 'gt'
+    GTE = 'gte'
+
+# Operators taking a comma separated list of values
+LIST_OPS = (FilterOp.IN, FilterOp.ALL)
+
+
+class FilterSpec:
+    """
+        A filterable field: how to parse its values and which operators it supports
+        (equality when none is given).
+    """
+
+    def __init__(self, value_type, *ops):
+        self.value_type = value_type
+        self.ops = ops or (FilterOp.EQ,)
+
+
+class CompiledFilters:
+    """
+        Filters of a model, compiled from its FILTERS spec: every accepted query
+        parameter is mapped to the mongoengine lookup it becomes. Each filtered field
+        must be the second key of an owner-prefixed index, so filters always narrow
+        an index scan of the owner's documents.
+    """
+
+    def __init__(self, coll_class):
+        self.coll_class = coll_class
+        self.params = {}
+
+        indexed = {spec['fields'][1][0] for spec in coll_class._meta['index_specs']
+                   if len(spec['fields']) > 1 and spec['fields'][0] == ('owner', 1)}
+
+        for field, spec in getattr(coll_class, 'FILTERS', {}).items():
+            if field not in coll_class._fields:
+                raise ValueError('{} has no field {}'.format(coll_class.__name__, field))
+
+            if field not in indexed:
+                raise ValueError('filter on {}.{} can\'t use an index, declare an (owner, {}) index'.format(coll_class.__name__, field, field))
+
+            for op in spec.ops:
+                # Parameters have the same syntax of mongoengine lookups
+                self.params[field if op == FilterOp.EQ else field + OP_SEPARATOR + op] = (op, spec.value_type)
+
+    def build_query(self, args) -> Q:
+        query = Q()
+
+        for param, value in args.items():
+            field = param.split(OP_SEPARATOR)[0]
+
+            if param not in self.params:
+                # Other query parameters (pagination, ordering, ...) are not filters
+                if field in self.coll_class._fields:
+                    raise BadRequest('can\'t filter by {}'.format(param), sorted(self.params))
+                continue
+
+            op, value_type = self.params[param]
+
+            try:
+                if op in LIST_OPS:
+                    value = [value_type(item.strip()) for item in value.split(',') if item.strip() != '']
+                else:
+                    value = value_type(value)
+            except ValueError as ex:
+                raise BadRequest('invalid {} parameter supplied: {}'.format(param, ex))
+
+            query = query & Q(**{param: value})
+
+        return query
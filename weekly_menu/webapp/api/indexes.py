@@ -0,0 +1,116 @@
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .models import Ingredient, Recipe, Menu, ShoppingList
+
+_logger = logging.getLogger(__name__)
+
+# Models whose indexes are not created automatically by mongoengine
+MANAGED_MODELS = (Ingredient, Recipe, Menu, ShoppingList)
+
+class IndexCheck:
+    OFF = 'off'
+    WARN = 'warn'
+    FAIL = 'fail'
+    CREATE = 'create'
+
+DEFAULT_INDEX_CHECK = IndexCheck.WARN
+
+
+class MissingIndexesError(Exception):
+    pass
+
+
+# Mongo stores the fields of a text index as a single pair of keys
+TEXT_INDEX_KEYS = [('_fts', 'text'), ('_ftsx', 1)]
+
+def _normalize_key(key):
+    normalized = []
+
+    for field, direction in key:
+        if direction == 'text' or field in ('_fts', '_ftsx'):
+            if TEXT_INDEX_KEYS[0] not in normalized:
+                normalized += TEXT_INDEX_KEYS
+        else:
+            normalized.append((field, int(direction) if isinstance(direction, (int, float)) else direction))
+
+    return normalized
+
+
+def declared_indexes(model) -> list:
+    return [_normalize_key(spec['fields']) for spec in model._meta['index_specs']]
+
+
+def existing_indexes(model) -> dict:
+    return {name: _normalize_key(info['key']) for name, info in model._get_collection().index_information().items()}
+
+
+def missing_indexes(model) -> list:
+    existing = list(existing_indexes(model).values())
+    return [key for key in declared_indexes(model) if key not in existing]
+
+
+def unused_indexes(model):
+    """
+        Indexes never used since the server started (or since they were built), as
+        (name, declared) tuples. None when the server does not report index usage.
+    """
+    try:
+        stats = list(model._get_collection().aggregate([{'$indexStats': {}}]))
+    except (OperationFailure, NotImplementedError):
+        return None
+
+    declared = declared_indexes(model)
+
+    return [
+        (stat['name'], _normalize_key(stat['key'].items()) in declared)
+        for stat in stats
+        if stat['name'] != '_id_' and stat['accesses']['ops'] == 0
+    ]
+
+
+def ensure_indexes(models=MANAGED_MODELS) -> dict:
+    """
+        Build the missing indexes of each model (in background) and return them by model.
+    """
+    built = {}
+
+    for model in models:
+        missing = missing_indexes(model)
+        if missing:
+            model.ensure_indexes()
+            built[model] = missing
+
+    return built
+
+
+def check_indexes(app):
+    mode = app.config.get('INDEX_CHECK', DEFAULT_INDEX_CHECK)
+
+    if mode == IndexCheck.OFF:
+        return
+
+    if mode == IndexCheck.CREATE:
+        for model, keys in ensure_indexes().items():
+            _logger.info('built indexes on %s: %s', model._get_collection_name(), keys)
+        return
+
+    try:
+        missing = {model._get_collection_name(): missing_indexes(model) for model in MANAGED_MODELS}
+    except PyMongoError as e:
+        if mode == IndexCheck.FAIL:
+            raise
+        _logger.warning('unable to verify indexes: %s', e)
+        return
+
+    missing = {collection: keys for collection, keys in missing.items() if keys}
+
+    if not missing:
+        return
+
+    if mode == IndexCheck.FAIL:
+        raise MissingIndexesError('missing indexes (run scripts/sync_indexes.py)', missing)
+
+    for collection, keys in missing.items():
+        _logger.warning('missing indexes on %s: %s (run scripts/sync_indexes.py)', collection, keys)
@@ -3,4 +3,13 @@ from .recipe import Recipe, RecipeIngredient
 from .shopping_list import ShoppingList, ShoppingListItem
 from .user import User
 from .menu import Menu
-from .config import Config
\ No newline at end of file
+from .config import Config
+from .refresh_token import RefreshToken
+from .revoked_token import RevokedToken
+from .rate_limit_bucket import RateLimitBucket
+from .list_version import ListVersion
+
+__all__ = [
+    'Ingredient', 'Recipe', 'RecipeIngredient', 'ShoppingList', 'ShoppingListItem', 'User', 'Menu', 'Config',
+    'RefreshToken', 'RevokedToken', 'RateLimitBucket', 'ListVersion'
+]
@@ -1,7 +1,6 @@
-from datetime import datetime
 from bson import ObjectId
 
-from .. import mongo
+from .. import mongo, current_timestamp
 
 class BaseDocument(mongo.Document):
 
@@ -9,10 +8,20 @@ class BaseDocument(mongo.Document):
 
   owner = mongo.ReferenceField('User', required=True)
 
-  insert_timestamp = mongo.LongField(required=True, default=lambda: int(datetime.utcnow().timestamp()*1000))
-  update_timestamp = mongo.LongField(required=True, default=lambda: int(datetime.utcnow().timestamp()*1000))
+  insert_timestamp = mongo.LongField(required=True, default=current_timestamp)
+  # Kept by the write helpers of the api module (see save_document and update_documents)
+  update_timestamp = mongo.LongField(required=True, default=current_timestamp)
 
+  # Every query is scoped by owner, so each index starts with it. Indexes ending
+  # with _id make their middle field sortable (see get_sortable_fields). They are
+  # not built on first access: use scripts/sync_indexes.py (see also INDEX_CHECK)
   meta = {
     'abstract': True,
-    'strict': False
+    'strict': False,
+    'auto_create_index': False,
+    'index_background': True,
+    'indexes': [
+      ('owner', '_id'),
+      ('owner', 'update_timestamp', '_id')
+    ]
   }
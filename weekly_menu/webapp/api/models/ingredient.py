@@ -1,8 +1,23 @@
+from flask_restful import inputs
+
 from .. import mongo
 
 from .base_document import BaseDocument
+from ..search import text_index
+from ..filters import FilterSpec, FilterOp
 
 class Ingredient(BaseDocument):
+    # Fields matched by the 'q' search parameter, with their relevance
+    SEARCH_WEIGHTS = {'name': 10, 'tags': 5, 'description': 2, 'note': 2}
+
+    # Query parameters accepted by the list endpoint, each one needs an (owner, field) index
+    FILTERS = {
+        'tags': FilterSpec(str, FilterOp.EQ, FilterOp.IN, FilterOp.ALL),
+        'availabilityMonths': FilterSpec(int, FilterOp.EQ, FilterOp.IN, FilterOp.ALL),
+        'edible': FilterSpec(inputs.boolean),
+        'freezed': FilterSpec(inputs.boolean)
+    }
+
     name = mongo.StringField(required=True)
     description = mongo.StringField()
     note = mongo.StringField()
@@ -16,7 +31,15 @@ class Ingredient(BaseDocument):
     )
 
     meta = {
-        'collection' : 'ingredients'
+        'collection' : 'ingredients',
+        'indexes': [
+            ('owner', 'name', '_id'),
+            ('owner', 'tags'),
+            ('owner', 'availabilityMonths'),
+            ('owner', 'edible'),
+            ('owner', 'freezed'),
+            text_index(SEARCH_WEIGHTS)
+        ]
     }
 
     def __repr__(self):
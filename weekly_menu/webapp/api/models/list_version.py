@@ -0,0 +1,15 @@
+from .. import mongo
+
+class ListVersion(mongo.Document):
+    # '<collection>:<owner id>', see conditional.get_list_key
+    key = mongo.StringField(primary_key=True)
+    # Incremented by every write to the owner's collection, deletes included
+    version = mongo.LongField(required=True, default=0)
+    update_timestamp = mongo.LongField()
+
+    meta = {
+        'collection' : 'list_versions'
+    }
+
+    def __repr__(self):
+           return "<ListVersion '{}'>".format(self.key)
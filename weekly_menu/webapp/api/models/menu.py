@@ -1,21 +1,40 @@
 from .. import mongo
 
 from .base_document import BaseDocument
+from ..filters import FilterSpec, FilterOp
+from ..expansion import ExpandSpec
 
 class Menu(BaseDocument):
     name = mongo.StringField()
     date = mongo.DateField(required=True)
     meal = mongo.StringField()
+    # Pulled by the recipe deletion (see RecipeInstance.delete)
     recipes = mongo.ListField(
-        mongo.ReferenceField('Recipe', reverse_delete_rule=mongo.PULL), default=None
+        mongo.ReferenceField('Recipe'), default=None
     )
 
     #It could be useful to have an history of user's menu also when they leave
     # REMOVED - probably not usefull
     # owner = mongo.ReferenceField('User', required=True, reverse_delete_rule=mongo.NULLIFY)
 
+    # Query parameters accepted by the list endpoint, each one needs an (owner, field) index
+    FILTERS = {
+        'meal': FilterSpec(str, FilterOp.EQ, FilterOp.IN)
+    }
+
+    # References replaced by the referenced documents with expand=<name>
+    EXPANSIONS = {
+        'recipes': ExpandSpec('recipes')
+    }
+
     meta = {
-        'collection' : 'menu'
+        'collection' : 'menu',
+        'indexes': [
+            ('owner', 'date', '_id'),
+            ('owner', 'meal'),
+            # Used to pull a deleted recipe from the menus
+            ('owner', 'recipes')
+        ]
     }
 
     def __repr__(self):
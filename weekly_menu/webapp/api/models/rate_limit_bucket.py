@@ -0,0 +1,19 @@
+from .. import mongo
+
+class RateLimitBucket(mongo.Document):
+    key = mongo.StringField(primary_key=True)
+    tokens = mongo.FloatField(required=True)
+    # Epoch (seconds) of the last refill
+    stamp = mongo.FloatField(required=True)
+    # An idle bucket is full again after a whole period, no need to keep it
+    expires = mongo.DateTimeField(required=True)
+
+    meta = {
+        'collection' : 'rate_limit_buckets',
+        'indexes': [
+            {'fields': ['expires'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+    def __repr__(self):
+           return "<RateLimitBucket '{}'>".format(self.key)
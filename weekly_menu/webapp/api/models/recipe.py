@@ -1,6 +1,9 @@
 from .. import mongo
 
 from .base_document import BaseDocument
+from ..search import text_index
+from ..filters import FilterSpec, FilterOp
+from ..expansion import ExpandSpec
 
 class RecipeIngredient(mongo.EmbeddedDocument):
     quantity = mongo.FloatField()
@@ -11,6 +14,25 @@ class RecipeIngredient(mongo.EmbeddedDocument):
 
 
 class Recipe(BaseDocument):
+    # Fields matched by the 'q' search parameter, with their relevance
+    SEARCH_WEIGHTS = {'name': 10, 'tags': 5, 'description': 2, 'note': 2, 'preparation': 1}
+
+    # Query parameters accepted by the list endpoint, each one needs an (owner, field) index
+    FILTERS = {
+        'tags': FilterSpec(str, FilterOp.EQ, FilterOp.IN, FilterOp.ALL),
+        'availabilityMonths': FilterSpec(int, FilterOp.EQ, FilterOp.IN, FilterOp.ALL),
+        'rating': FilterSpec(int, FilterOp.EQ, FilterOp.LTE, FilterOp.GTE),
+        'cost': FilterSpec(int, FilterOp.EQ, FilterOp.LTE, FilterOp.GTE),
+        'difficulty': FilterSpec(str, FilterOp.EQ, FilterOp.IN),
+        'estimatedCookingTime': FilterSpec(int, FilterOp.LTE, FilterOp.GTE),
+        'estimatedPreparationTime': FilterSpec(int, FilterOp.LTE, FilterOp.GTE)
+    }
+
+    # References replaced by the referenced documents with expand=<name>
+    EXPANSIONS = {
+        'ingredients': ExpandSpec('ingredients', 'ingredient')
+    }
+
     name = mongo.StringField(required=True)
     description = mongo.StringField()
     preparation = mongo.StringField() #TODO will be a list of strings
@@ -32,7 +54,19 @@ class Recipe(BaseDocument):
     )
 
     meta = {
-        'collection': 'recipes'
+        'collection': 'recipes',
+        'indexes': [
+            ('owner', 'name', '_id'),
+            ('owner', 'ingredients.ingredient'),
+            ('owner', 'tags'),
+            ('owner', 'availabilityMonths'),
+            ('owner', 'rating'),
+            ('owner', 'cost'),
+            ('owner', 'difficulty'),
+            ('owner', 'estimatedCookingTime'),
+            ('owner', 'estimatedPreparationTime'),
+            text_index(SEARCH_WEIGHTS)
+        ]
     }
 
     def __repr__(self):
@@ -0,0 +1,21 @@
+from .. import mongo
+
+class RefreshToken(mongo.Document):
+    # Every refresh token issued from the same login shares the family of the first one,
+    # when a token is replayed the whole family is revoked
+    jti = mongo.StringField(primary_key=True)
+    family = mongo.StringField(required=True)
+    user = mongo.ReferenceField('User', required=True)
+    used = mongo.BooleanField(default=False)
+    expires = mongo.DateTimeField()
+
+    meta = {
+        'collection' : 'refresh_tokens',
+        'indexes': [
+            'family',
+            {'fields': ['expires'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+    def __repr__(self):
+           return "<RefreshToken '{}'>".format(self.jti)
@@ -0,0 +1,18 @@
+from .. import mongo
+
+class RevokedToken(mongo.Document):
+    jti = mongo.StringField(primary_key=True)
+    revoked_at = mongo.DateTimeField(required=True)
+    # Revocation is pointless once the token expires, Mongo removes the document then
+    expires = mongo.DateTimeField(required=True)
+
+    meta = {
+        'collection' : 'revoked_tokens',
+        'indexes': [
+            'revoked_at',
+            {'fields': ['expires'], 'expireAfterSeconds': 0}
+        ]
+    }
+
+    def __repr__(self):
+           return "<RevokedToken '{}'>".format(self.jti)
@@ -2,6 +2,7 @@ from .. import mongo
 from ..models import Ingredient
 
 from .base_document import BaseDocument
+from ..expansion import ExpandSpec
 
 
 class ShoppingListItem(mongo.EmbeddedDocument):
@@ -17,8 +18,17 @@ class ShoppingList(BaseDocument):
     name = mongo.StringField(required=True)
     items = mongo.EmbeddedDocumentListField('ShoppingListItem', default=None)
 
+    # References replaced by the referenced documents with expand=<name>
+    EXPANSIONS = {
+        'items': ExpandSpec('items', 'item')
+    }
+
     meta = {
-        'collection' : 'shopping_lists'
+        'collection' : 'shopping_lists',
+        'indexes': [
+            ('owner', 'name', '_id'),
+            ('owner', 'items.item')
+        ]
     }
 
     def __repr__(self):
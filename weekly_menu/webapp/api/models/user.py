@@ -1,4 +1,4 @@
-from .. import mongo
+from .. import mongo, principal_cache
 
 class User(mongo.Document):
     MIN_USERNAME_LENGTH = 4
@@ -15,10 +15,29 @@ class User(mongo.Document):
         mongo.IntField(min_value=1, max_value=7)
     )
 
+    # Bumped on credential changes, tokens carrying an older version are rejected
+    version = mongo.IntField(default=0)
+
     meta = {
         'collection' : 'users',
         'strict': False
     }
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None and {'email', 'password'} & set(self._get_changed_fields()):
+            self.version = (self.version or 0) + 1
+
+        result = super().save(*args, **kwargs)
+        self.invalidate_principal()
+        return result
+
+    def delete(self, *args, **kwargs):
+        self.invalidate_principal()
+        return super().delete(*args, **kwargs)
+
+    def invalidate_principal(self):
+        # Email could be changed, so drop every cached entry pointing to this user
+        principal_cache.invalidate_where(lambda identity, user: user.id == self.id)
+
     def __repr__(self):
            return "<User '{}'>".format(self.username)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import itertools
+import math
+
+from bson import json_util, ObjectId
+from flask import abort
+from mongoengine.queryset.visitor import Q
+
+from .exceptions import BadRequest
+
+ID_FIELD = '_id'
+
+class Page:
+    """
+        A page of results. 'total' (and so 'pages') is None when the count was not
+        requested, 'next' is the cursor to the following page in keyset pagination
+        (None if this is the last one).
+
+        When the page is paginated with a batch_size, 'items' is an iterator reading
+        the database cursor as it goes and 'next' is only set once it is exhausted.
+    """
+
+    def __init__(self, items, per_page, total=None, next=None):
+        self.items = items
+        self.total = total
+        self.pages = int(math.ceil(total / float(per_page))) if total is not None else None
+        self.next = next
+
+
+def encode_cursor(value, last_id) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps([value, last_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    try:
+        value, last_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, binascii.Error):
+        raise BadRequest('invalid after cursor supplied')
+
+    if not isinstance(last_id, ObjectId):
+        raise BadRequest('invalid after cursor supplied')
+
+    return value, last_id
+
+
+def _after_filter(field: str, value, last_id: ObjectId, desc: bool) -> Q:
+    # Documents missing the sort field sort before any other value
+    if field == ID_FIELD:
+        return Q(_id__lt=last_id) if desc else Q(_id__gt=last_id)
+
+    if desc:
+        if value is None:
+            return Q(**{field: None}) & Q(_id__lt=last_id)
+        return Q(**{field + '__lt': value}) | (Q(**{field: value}) & Q(_id__lt=last_id)) | Q(**{field: None})
+    else:
+        if value is None:
+            return (Q(**{field: None}) & Q(_id__gt=last_id)) | Q(**{field + '__ne': None})
+        return Q(**{field + '__gt': value}) | (Q(**{field: value}) & Q(_id__gt=last_id))
+
+
+def _next_cursor(item, field: str) -> str:
+    last = item if isinstance(item, dict) else item.to_mongo()
+    return encode_cursor(last.get(field), last[ID_FIELD])
+
+
+def _iter_batches(queryset, batch_size: int):
+    # Without cache, so read documents can be released while iterating. A generator:
+    # iter() of a queryset being read rewinds it
+    return (document for document in queryset.no_cache().batch_size(batch_size))
+
+
+def _iter_cursor_page(page: Page, items, field: str, per_page: int):
+    last = None
+
+    for count, item in enumerate(items):
+        if count == per_page:
+            page.next = _next_cursor(last, field)
+            return
+
+        last = item
+        yield item
+
+
+def check_page(page: int, empty: bool):
+    # As flask_mongoengine's Pagination: only the first page may be empty
+    if empty and page != 1:
+        abort(404)
+
+
+def paginate_by_offset(queryset, page: int, per_page: int, total=None, batch_size=None) -> Page:
+    """
+        Page of a sorted queryset, aborting with 404 if it's past the last one.
+    """
+    queryset = queryset.skip((page - 1) * per_page).limit(per_page)
+
+    if batch_size is not None:
+        items = _iter_batches(queryset, batch_size)
+        first = next(items, None)
+        check_page(page, first is None)
+
+        return Page(itertools.chain([first], items) if first is not None else items, per_page, total)
+
+    items = list(queryset)
+    check_page(page, len(items) == 0)
+
+    return Page(items, per_page, total)
+
+
+def paginate_by_cursor(queryset, field: str, desc: bool, after: str, per_page: int, total=None, batch_size=None) -> Page:
+    """
+        Keyset pagination: documents are sorted by (field, _id) and each page starts
+        right after the (field, _id) pair encoded in the 'after' cursor, so the
+        database never skips over the previous pages.
+    """
+    field = field or ID_FIELD
+    sign = '-' if desc else '+'
+
+    if after:
+        value, last_id = decode_cursor(after)
+        queryset = queryset.filter(_after_filter(field, value, last_id, desc))
+
+    if field == ID_FIELD:
+        queryset = queryset.order_by(sign + ID_FIELD)
+    else:
+        queryset = queryset.order_by(sign + field, sign + ID_FIELD)
+
+    # One more document tells whether a next page exists
+    queryset = queryset.limit(per_page + 1)
+
+    if batch_size is not None:
+        page = Page(None, per_page, total)
+        page.items = _iter_cursor_page(page, _iter_batches(queryset, batch_size), field, per_page)
+        return page
+
+    items = list(queryset)
+
+    if len(items) <= per_page:
+        return Page(items, per_page, total)
+
+    items = items[:per_page]
+
+    return Page(items, per_page, total, _next_cursor(items[-1], field))
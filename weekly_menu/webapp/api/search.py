@@ -0,0 +1,126 @@
+import re
+
+from collections import defaultdict
+
+from .cache import LRUCache
+from .pagination import Page, check_page, paginate_by_offset
+
+TOKEN_REGEX = re.compile(r'\w+', re.UNICODE)
+
+class SearchBackend:
+    TEXT = 'text'
+    MEMORY = 'memory'
+
+DEFAULT_SEARCH_BACKEND = SearchBackend.TEXT
+DEFAULT_SEARCH_CACHE_SIZE = 256
+DEFAULT_SEARCH_CACHE_TTL = 60
+
+def tokenize(value) -> list:
+    if value is None:
+        return []
+
+    if isinstance(value, (list, tuple)):
+        return [token for item in value for token in tokenize(item)]
+
+    return TOKEN_REGEX.findall(str(value).lower())
+
+
+def text_index(weights: dict) -> dict:
+    """
+        Owner-prefixed text index spec over the weighted fields. Tokens are not stemmed,
+        the same as the in-process index.
+    """
+    return {
+        'fields': ['owner'] + ['$' + field for field in weights],
+        'weights': weights,
+        'default_language': 'none'
+    }
+
+
+def get_search_weights(coll_class) -> dict:
+    return getattr(coll_class, 'SEARCH_WEIGHTS', None) or {}
+
+
+class InvertedIndex:
+    """
+        Token -> {document id: score} postings of the documents of a single owner.
+    """
+
+    def __init__(self, documents, weights: dict):
+        self._postings = defaultdict(lambda: defaultdict(float))
+
+        for document in documents:
+            for field, weight in weights.items():
+                for token in tokenize(document.get(field)):
+                    self._postings[token][document['_id']] += weight
+
+    def scores(self, q: str) -> dict:
+        scores = defaultdict(float)
+
+        for token in set(tokenize(q)):
+            for doc_id, score in self._postings.get(token, {}).items():
+                scores[doc_id] += score
+
+        return scores
+
+
+class SearchIndex:
+    """
+        Full-text search on the owner's documents. The 'text' backend relies on the
+        text index declared on the model, the 'memory' one keeps an inverted index
+        per (collection, owner) in this process, built on the first search and
+        dropped on every write (see on_write).
+    """
+
+    def __init__(self):
+        self.backend = DEFAULT_SEARCH_BACKEND
+        self._indexes = LRUCache(DEFAULT_SEARCH_CACHE_SIZE, DEFAULT_SEARCH_CACHE_TTL)
+
+    def init_app(self, app):
+        self.backend = app.config.get('SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND)
+        self._indexes.configure(
+            app.config.get('SEARCH_CACHE_SIZE', DEFAULT_SEARCH_CACHE_SIZE),
+            app.config.get('SEARCH_CACHE_TTL', DEFAULT_SEARCH_CACHE_TTL)
+        )
+
+    def filter(self, queryset, owner_id, q: str):
+        if self.backend == SearchBackend.TEXT:
+            return queryset.search_text(q)
+
+        return queryset.filter(_id__in=list(self._scores(queryset._document, owner_id, q)))
+
+    def paginate_by_relevance(self, queryset, owner_id, q: str, page: int, per_page: int, total=None, batch_size=None) -> Page:
+        """
+            Page of a filtered queryset (see filter) sorted by decreasing relevance.
+            The 'memory' backend always loads the whole page.
+        """
+        if self.backend == SearchBackend.TEXT:
+            return paginate_by_offset(queryset.order_by('$text_score'), page, per_page, total, batch_size)
+
+        scores = self._scores(queryset._document, owner_id, q)
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        ranked = ranked[(page - 1) * per_page:page * per_page]
+        check_page(page, len(ranked) == 0)
+
+        # Documents are plain dicts when only some fields are loaded
+        documents = {document['_id'] if isinstance(document, dict) else document.pk: document
+                     for document in queryset.filter(_id__in=ranked)}
+
+        return Page([documents[doc_id] for doc_id in ranked if doc_id in documents], per_page, total)
+
+    def invalidate(self, coll_class, owner_id):
+        self._indexes.invalidate((coll_class._get_collection_name(), str(owner_id)))
+
+    def clear(self):
+        self._indexes.clear()
+
+    def _scores(self, coll_class, owner_id, q: str) -> dict:
+        key = (coll_class._get_collection_name(), str(owner_id))
+        index = self._indexes.get(key)
+
+        if index is None:
+            weights = get_search_weights(coll_class)
+            index = InvertedIndex(coll_class.objects(owner=owner_id).only(*weights).as_pymongo(), weights)
+            self._indexes.set(key, index)
+
+        return index.scores(q)
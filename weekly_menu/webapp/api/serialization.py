@@ -0,0 +1,253 @@
+import math
+import re
+
+from datetime import date, datetime, time, timezone
+from bson import ObjectId, DBRef, Binary
+from bson.errors import InvalidId
+from flask import current_app, jsonify, json, stream_with_context
+from mongoengine import fields
+
+try:
+    import orjson
+except ImportError:
+    # Optional, the standard encoder is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    # Optional, application/msgpack is not offered without it
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Extension type of ObjectIds (their 12 bytes), dates use the timestamp extension
+OBJECT_ID_EXT_TYPE = 1
+
+# json escapes everything outside of printable ASCII, orjson only control characters
+NON_ASCII_REGEX = re.compile('[^\x00-\x7e]')
+NON_ASCII_BYTES_REGEX = re.compile(b'[\x7f-\xff]')
+
+# Layout of each document class, see get_layout
+_layouts = {}
+
+class _ReprFloat(float):
+    """
+        Float that orjson and json would render differently (exponent, nan or
+        infinity): orjson refuses it, so the standard encoder is used.
+    """
+
+
+def _to_int(value):
+    return value if type(value) is int else int(value)
+
+def _to_float(value):
+    value = float(value)
+
+    if not math.isfinite(value) or 'e' in repr(value):
+        return _ReprFloat(value)
+
+    return value
+
+def _to_id(value):
+    return value.id if isinstance(value, DBRef) else value
+
+def _list_of(convert):
+    return lambda value: [convert(item) for item in value]
+
+def _embedded(document_class):
+    return lambda value: to_serializable(document_class, value)
+
+def _get_converter(field):
+    # Same conversions applied by to_mongo() on hydrated documents
+    if isinstance(field, (fields.IntField, fields.LongField)):
+        return _to_int
+    if isinstance(field, fields.FloatField):
+        return _to_float
+    if isinstance(field, fields.BooleanField):
+        return bool
+    if isinstance(field, fields.ReferenceField):
+        return _to_id
+    if isinstance(field, fields.EmbeddedDocumentField):
+        return _embedded(field.document_type)
+    if isinstance(field, fields.ListField) and field.field is not None:
+        convert = _get_converter(field.field)
+        return _list_of(convert) if convert is not None else None
+    return None
+
+
+def get_layout(document_class) -> list:
+    """
+        (db field, converter) pairs in the order to_mongo() writes them.
+    """
+    layout = _layouts.get(document_class)
+
+    if layout is None:
+        layout = [(document_class._fields[name].db_field, _get_converter(document_class._fields[name]))
+                  for name in document_class._fields_ordered]
+        _layouts[document_class] = layout
+
+    return layout
+
+
+def to_serializable(document_class, raw: dict) -> dict:
+    """
+        Turn a document read with as_pymongo() into what to_mongo() returns for the
+        hydrated one: declared fields only, in declaration order, without None values.
+    """
+    document = {}
+
+    for name, convert in get_layout(document_class):
+        value = raw.get(name)
+        if value is not None:
+            document[name] = convert(value) if convert is not None else value
+
+    return document
+
+
+def _default(o):
+    # Same as ObjectIdJSONEncoder
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, date):
+        return o.strftime("%Y-%m-%d")
+    if isinstance(o, Binary):
+        return str(o)
+    raise TypeError
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group(0))
+
+    if code <= 0xffff:
+        return '\\u{0:04x}'.format(code)
+
+    code -= 0x10000
+    return '\\u{0:04x}\\u{1:04x}'.format(0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+def _jsonify(data, code):
+    response = jsonify(data)
+    response.status_code = code
+    return response
+
+def dumps(data) -> bytes:
+    """
+        Compact encoding of data, the same of jsonify without its trailing newline.
+    """
+    config = current_app.config
+
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if config['JSON_SORT_KEYS']:
+            option |= orjson.OPT_SORT_KEYS
+
+        try:
+            body = orjson.dumps(data, default=_default, option=option)
+        except TypeError:
+            body = None
+
+        if body is not None:
+            if config['JSON_AS_ASCII'] and NON_ASCII_BYTES_REGEX.search(body):
+                body = NON_ASCII_REGEX.sub(_escape_non_ascii, body.decode('utf-8')).encode('ascii')
+            return body
+
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(data, code=200):
+    """
+        Same response of jsonify(data), byte by byte, encoded with orjson when it is
+        available.
+    """
+    config = current_app.config
+
+    if orjson is None or config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug:
+        return _jsonify(data, code)
+
+    return current_app.response_class(dumps(data) + b'\n', status=code, mimetype=config['JSONIFY_MIMETYPE'])
+
+
+def _stream_page(page, with_next: bool, batch_size: int):
+    yield b'{"results":['
+
+    separator = b''
+    batch = []
+
+    # Items are encoded a batch at a time, as they are read from the database
+    for item in page.items:
+        batch.append(item)
+
+        if len(batch) == batch_size:
+            yield separator + dumps(batch)[1:-1]
+            separator = b','
+            batch = []
+
+    if batch:
+        yield separator + dumps(batch)[1:-1]
+
+    # The cursor of the next page is known once every item has been read
+    tail = {}
+    if page.total is not None:
+        tail['pages'] = page.pages
+        tail['total'] = page.total
+    if with_next:
+        tail['next'] = page.next
+
+    yield b']' + (b',' + dumps(tail)[1:-1] if tail else b'') + b'}\n'
+
+
+def stream_response(page, with_next: bool, batch_size: int):
+    """
+        Chunked response of a page with the same body of the paginated one, without
+        holding every item in memory. Keys are in the same order of the paginated
+        response, so it differs from it when JSON_SORT_KEYS is enabled.
+    """
+    return current_app.response_class(stream_with_context(_stream_page(page, with_next, batch_size)),
+                                      mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+def _msgpack_default(o):
+    # Binary, being bytes, is already packed as bin
+    if isinstance(o, ObjectId):
+        return msgpack.ExtType(OBJECT_ID_EXT_TYPE, o.binary)
+    if isinstance(o, datetime):
+        return msgpack.Timestamp.from_datetime(o if o.tzinfo is not None else o.replace(tzinfo=timezone.utc))
+    if isinstance(o, date):
+        return msgpack.Timestamp.from_datetime(datetime.combine(o, time(), timezone.utc))
+    raise TypeError('can\'t serialize {!r}'.format(o))
+
+
+def _msgpack_ext_hook(code, data):
+    if code == OBJECT_ID_EXT_TYPE:
+        return str(ObjectId(data))
+    return msgpack.ExtType(code, data)
+
+
+def _from_msgpack(value):
+    # Timestamps become the strings accepted by the schemas (dates at midnight as days)
+    if isinstance(value, msgpack.Timestamp):
+        value = value.to_datetime()
+        return value.date().isoformat() if value.time() == time() else value.isoformat()
+    return value
+
+
+def dumps_msgpack(data) -> bytes:
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def loads_msgpack(data: bytes):
+    """
+        Decode a msgpack payload into what its JSON form would be decoded to: ObjectIds
+        and timestamps are turned into strings. Raises ValueError if it's not valid.
+    """
+    try:
+        return _from_msgpack(msgpack.unpackb(data, raw=False, ext_hook=_msgpack_ext_hook,
+                                             object_hook=lambda obj: {key: _from_msgpack(value) for key, value in obj.items()},
+                                             list_hook=lambda items: [_from_msgpack(value) for value in items]))
+    except (TypeError, InvalidId, msgpack.UnpackException) as ex:
+        raise ValueError(str(ex))
+
+
+def msgpack_response(data, code=200):
+    return current_app.response_class(dumps_msgpack(data), status=code, mimetype=MSGPACK_MIMETYPE)
@@ -1,18 +1,36 @@
+import logging
+
 from flask_jwt_extended import JWTManager
-from flask_bcrypt import Bcrypt
 
+from .hashing import PasswordHasher
+from .revocation import RevocationStore
+from .throttling import RateLimiter
 from ...models import User
+from ...exceptions import ServiceUnavailable
+
+_logger = logging.getLogger(__name__)
 
 jwt = JWTManager()
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
+revocation_store = RevocationStore()
+rate_limiter = RateLimiter()
 
 def create_module(app, **kwargs):
-    bcrypt.init_app(app)
+    app.config.setdefault('JWT_BLACKLIST_ENABLED', True)
+    app.config.setdefault('JWT_BLACKLIST_TOKEN_CHECKS', ['access', 'refresh'])
+
+    password_hasher.init_app(app)
+    revocation_store.init_app(app)
+    rate_limiter.init_app(app)
     jwt.init_app(app)
 
     from .controllers import auth_blueprint
     app.register_blueprint(auth_blueprint)
 
+@jwt.token_in_blacklist_loader
+def is_token_revoked(decrypted_token):
+    return revocation_store.is_revoked(decrypted_token['jti'])
+
 def authenticate(email, password):
     user = get_user_by_email(email)
     
@@ -20,11 +38,26 @@ def authenticate(email, password):
         return None
     
     # Do the passwords match
-    if not bcrypt.check_password_hash(user.password, password):
+    if not password_hasher.check_password_hash(user.password, password):
         return None
+
+    if password_hasher.needs_rehash(user.password):
+        _rehash_password(user, password)
     
     return user
 
+def _rehash_password(user: User, password: str):
+    # Bring the stored hash to the configured cost, without bumping the user version
+    # (the password itself doesn't change so issued tokens must remain valid)
+    try:
+        user.password = encode_password(password)
+    except ServiceUnavailable:
+        _logger.warning('skipping password rehash for user %s, hashing pool is busy', user.id)
+        return
+
+    User.objects(id=user.id).update_one(set__password=user.password)
+    user.invalidate_principal()
+
 def get_user_by_email(email):
     user = User.objects(
         email__exact=email
@@ -33,4 +66,4 @@ def get_user_by_email(email):
     return user
 
 def encode_password(password: str) -> str:
-    return bcrypt.generate_password_hash(str(password))
\ No newline at end of file
+    return password_hasher.generate_password_hash(str(password))
\ No newline at end of file
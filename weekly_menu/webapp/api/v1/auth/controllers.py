@@ -1,16 +1,20 @@
 
+from datetime import datetime
 from uuid import uuid4
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_refresh_token_required, jwt_optional, get_jwt_identity, get_jwt_claims, get_raw_jwt, get_jti, decode_token
 from flask_jwt_extended.config import config
 from marshmallow_mongoengine import schema
+from mongoengine.errors import NotUniqueError
 
-from . import authenticate, encode_password, get_user_by_email
+from . import authenticate, encode_password, get_user_by_email, revocation_store, rate_limiter
 from .schemas import PostRegisterUserSchema, PostUserTokenSchema, PostResetPasswordSchema
 from .. import BASE_PATH
-from ... import validate_payload
-from ...models import User, ShoppingList
-from ...exceptions import InvalidCredentials, NotFound
+from ... import validate_payload, get_request_payload, get_user_claims, resolve_user, UserClaims, notify_write, WriteOp
+from ...models import User, ShoppingList, RefreshToken
+from ...exceptions import InvalidCredentials, NotFound, Forbidden, DuplicateEntry
+
+REFRESH_FAMILY_CLAIM = 'fam'
 
 auth_blueprint = Blueprint(
     'auth',
@@ -19,6 +23,7 @@ auth_blueprint = Blueprint(
 )
 
 @auth_blueprint.route('/token', methods=['POST'])
+@rate_limiter.limit
 @validate_payload(PostUserTokenSchema(), 'user')
 def get_token(user: PostUserTokenSchema):
     user = authenticate(user['email'], user['password'])
@@ -26,27 +31,81 @@ def get_token(user: PostUserTokenSchema):
     if not user:
         raise InvalidCredentials("Provided credentials doesn't match for specific user")
 
+    return _issue_tokens(user, family=uuid4().hex)
+
+@auth_blueprint.route('/refresh', methods=['POST'])
+@jwt_refresh_token_required
+def refresh_token():
+    jti = get_raw_jwt()['jti']
+    family = get_jwt_claims().get(REFRESH_FAMILY_CLAIM)
+
+    # Refresh tokens are single use: the update succeeds only for the first request
+    # presenting this token, a replay means that it leaked
+    if RefreshToken.objects(jti=jti, used=False).update_one(set__used=True) != 1:
+        RefreshToken.objects(family=family).delete()
+        raise InvalidCredentials('refresh token is no longer valid, please login again')
+
+    try:
+        user = resolve_user(get_jwt_identity(), get_jwt_claims().get(UserClaims.VERSION))
+    except Forbidden:
+        RefreshToken.objects(family=family).delete()
+        raise InvalidCredentials('user credentials changed, please login again')
+
+    return _issue_tokens(user, family=family)
+
+def _issue_tokens(user: User, family: str):
+    user_claims = get_user_claims(user)
+
     # Identity can be any data that is json serializable
-    access_token = create_access_token(identity=user.email)
-    return jsonify(user_id=user.id,access_token=access_token, expires_in=config.access_expires.seconds), 200
+    access_token = create_access_token(identity=user.email, user_claims=user_claims)
+    refresh_token = create_refresh_token(identity=user.email, user_claims=dict(user_claims, **{REFRESH_FAMILY_CLAIM: family}))
+
+    RefreshToken(
+        jti=get_jti(refresh_token),
+        family=family,
+        user=user.id,
+        expires=(datetime.utcnow() + config.refresh_expires) if config.refresh_expires else None
+    ).save(force_insert=True)
+
+    return jsonify(user_id=user.id, access_token=access_token, refresh_token=refresh_token, expires_in=config.access_expires.seconds), 200
 
 
 @auth_blueprint.route('/register', methods=['POST'])
+@rate_limiter.limit
 @validate_payload(PostRegisterUserSchema(), 'user_meta')
 def register_user(user_meta: PostRegisterUserSchema):
     user = User()
     user.name = user_meta['name']
     user.password = encode_password(user_meta['password'])
     user.email = user_meta['email']
-    user.save()
 
-    # Create a new shopping list for the newly created user
+    try:
+        user.save()
+    except NotUniqueError:
+        # Could be the retry of a registration that already succeeded (or that
+        # stopped before creating the shopping list): same credentials, same user
+        user = authenticate(user_meta['email'], user_meta['password'])
+
+        if user is None:
+            raise DuplicateEntry('a user with the same email is already registered')
+
+    _create_default_shopping_list(user)
+    
+    return jsonify(user.to_mongo()), 200
+
+def _create_default_shopping_list(user: User):
+    # The default list shares the id of its owner, so creating it again is a no-op
     shop_list = ShoppingList()
     shop_list.owner = user.id
     shop_list.name = 'Shopping List' #TODO name of the list may vary based on the location of the user
-    shop_list.save()
-    
-    return jsonify(user.to_mongo()), 200
+
+    shop_list = shop_list.to_mongo()
+    shop_list.pop('_id', None)
+
+    result = ShoppingList._get_collection().update_one({'_id': user.id}, {'$setOnInsert': shop_list}, upsert=True)
+
+    if result.upserted_id is not None:
+        notify_write(WriteOp.INSERT, ShoppingList, user.id)
 
 @auth_blueprint.route('/reset_password', methods=['POST'])
 @validate_payload(PostResetPasswordSchema(), 'user_meta')
@@ -61,7 +120,20 @@ def reset_password(user_meta: PostResetPasswordSchema):
     return '', 204
 
 @auth_blueprint.route('/logout', methods=['POST'])
+@jwt_optional
 def logout():
-    # TODO: token validation and blacklisting
+    raw_jwt = get_raw_jwt()
+
+    if 'jti' in raw_jwt:
+        revocation_store.revoke(raw_jwt['jti'], datetime.utcfromtimestamp(raw_jwt['exp']))
+
+    # Optionally end the whole session, so the refresh token can't be used anymore. The
+    # body may be missing, even when a JSON Content-Type is sent
+    payload = get_request_payload(silent=True)
+
+    if isinstance(payload, dict) and payload.get('refresh_token'):
+        refresh_jwt = decode_token(payload['refresh_token'])
+        RefreshToken.objects(family=refresh_jwt[config.user_claims_key].get(REFRESH_FAMILY_CLAIM)).delete()
+
     return '', 204
     
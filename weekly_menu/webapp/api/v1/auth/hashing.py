@@ -0,0 +1,94 @@
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask_bcrypt import generate_password_hash, check_password_hash
+
+from ...exceptions import ServiceUnavailable
+
+DEFAULT_LOG_ROUNDS = 12
+DEFAULT_POOL_SIZE = 2
+DEFAULT_QUEUE_DEPTH = 8
+DEFAULT_RETRY_AFTER = 1
+
+def get_hash_cost(pw_hash) -> int:
+    # bcrypt hashes are in the form $<prefix>$<cost>$<salt+digest>
+    if isinstance(pw_hash, str):
+        pw_hash = pw_hash.encode('utf-8')
+
+    return int(bytes(pw_hash).split(b'$')[2])
+
+class PasswordHasher:
+    """
+        Runs bcrypt on a bounded pool of worker processes so that a burst of logins
+        can't keep the web workers busy. At most 'queue_depth' operations (running ones
+        included) are accepted at once, further calls fail fast with ServiceUnavailable.
+        A pool size of 0 hashes inline in the calling thread.
+    """
+
+    def __init__(self):
+        self.log_rounds = DEFAULT_LOG_ROUNDS
+        self.pool_size = 0
+        self.queue_depth = 0
+        self.retry_after = DEFAULT_RETRY_AFTER
+        self._slots = None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.log_rounds = int(app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS))
+        self.pool_size = int(app.config.get('PASSWORD_HASH_POOL_SIZE', DEFAULT_POOL_SIZE))
+        self.queue_depth = max(int(app.config.get('PASSWORD_HASH_QUEUE_DEPTH', DEFAULT_QUEUE_DEPTH)), self.pool_size)
+        self.retry_after = int(app.config.get('PASSWORD_HASH_RETRY_AFTER', DEFAULT_RETRY_AFTER))
+
+        self._slots = threading.BoundedSemaphore(self.queue_depth) if self.pool_size > 0 else None
+
+    def generate_password_hash(self, password, rounds=None):
+        return self._run(generate_password_hash, password, rounds or self.log_rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run(check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash) -> bool:
+        return get_hash_cost(pw_hash) != self.log_rounds
+
+    def _run(self, fn, *args):
+        if self._slots is None:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable('too many authentication requests, retry later', self.retry_after)
+
+        try:
+            # A pool whose process died can't be used anymore: it's replaced once
+            for attempt in range(2):
+                executor = self._get_executor()
+
+                try:
+                    return executor.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    self._drop_executor(executor)
+
+            raise ServiceUnavailable('authentication temporarily unavailable, retry later', self.retry_after)
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        # Worker processes are not inherited through fork (e.g. gunicorn --preload), so
+        # every process lazily starts its own pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+                self._executor_pid = os.getpid()
+
+            return self._executor
+
+    def _drop_executor(self, executor):
+        with self._lock:
+            # Other threads may have replaced it already
+            if self._executor is executor:
+                self._executor = None
+
+        executor.shutdown(wait=False)
@@ -0,0 +1,76 @@
+import threading
+
+from datetime import datetime, timedelta
+from time import monotonic
+
+from ...models import RevokedToken
+
+DEFAULT_SYNC_INTERVAL = 30
+
+# Re-read a small window before the last sync, so revocations committed late by
+# other workers are not skipped
+SYNC_OVERLAP = timedelta(seconds=5)
+
+class RevocationStore:
+    """
+        Revoked token ids, persisted in the 'revoked_tokens' collection and mirrored in
+        a process-local set. Checking a token is a set lookup: the set is refreshed with
+        an incremental query at most once every 'sync_interval' seconds, revocations
+        made by this process are visible immediately.
+    """
+
+    def __init__(self):
+        self.sync_interval = DEFAULT_SYNC_INTERVAL
+        self._revoked = {}
+        self._synced_until = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.sync_interval = int(app.config.get('JWT_REVOCATION_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL))
+        self.clear()
+
+    def revoke(self, jti: str, expires: datetime):
+        RevokedToken(jti=jti, revoked_at=datetime.utcnow(), expires=expires).save()
+
+        # sync() iterates the set while holding the lock
+        with self._lock:
+            self._revoked[jti] = expires
+
+    def is_revoked(self, jti: str) -> bool:
+        if monotonic() >= self._next_sync:
+            self.sync()
+
+        return jti in self._revoked
+
+    def sync(self):
+        with self._lock:
+            # Threads waiting for the lock find the set already synced by the first one
+            if monotonic() < self._next_sync:
+                return
+
+            now = datetime.utcnow()
+
+            if self._synced_until is None:
+                query = RevokedToken.objects(expires__gt=now)
+            else:
+                query = RevokedToken.objects(revoked_at__gte=self._synced_until - SYNC_OVERLAP)
+
+            for token in query.only('jti', 'expires').as_pymongo():
+                self._revoked[token['_id']] = token['expires']
+
+            # Expired tokens are rejected anyway, no need to remember them
+            for jti in [jti for jti, expires in self._revoked.items() if expires <= now]:
+                del self._revoked[jti]
+
+            self._synced_until = now
+            self._next_sync = monotonic() + self.sync_interval
+
+    def clear(self):
+        with self._lock:
+            self._revoked = {}
+            self._synced_until = None
+            self._next_sync = 0
+
+    def __len__(self):
+        return len(self._revoked)
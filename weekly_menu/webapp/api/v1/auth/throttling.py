@@ -0,0 +1,168 @@
+import math
+import threading
+
+from datetime import datetime, timedelta
+from functools import wraps
+from time import time
+from flask import request
+from pymongo.errors import DuplicateKeyError
+
+from ...cache import LRUCache
+from ...models import RateLimitBucket
+from ... import get_request_payload
+from ...exceptions import TooManyRequests
+
+DEFAULT_EMAIL_LIMIT = '10/60'
+DEFAULT_IP_LIMIT = '50/60'
+DEFAULT_LOCAL_BUCKETS = 100000
+
+# Optimistic updates attempted on a shared bucket before giving up
+MAX_SHARED_RETRIES = 5
+
+class RateLimitScope:
+    EMAIL = 'email'
+    IP = 'ip'
+
+
+def parse_limit(limit: str):
+    """
+        Parse a '<requests>/<seconds>' limit into a (capacity, refill per second) tuple.
+    """
+    requests, seconds = limit.split('/')
+    return float(requests), float(requests) / float(seconds)
+
+
+def _consume(tokens: float, stamp: float, capacity: float, rate: float, now: float):
+    """
+        Refill the bucket up to now and try to take one token out of it. Returns the
+        new amount of tokens and, if the bucket is empty, how many seconds to wait.
+    """
+    tokens = min(capacity, tokens + (now - stamp) * rate)
+
+    if tokens >= 1:
+        return tokens - 1, 0
+
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketBackend:
+    def __init__(self, max_size=DEFAULT_LOCAL_BUCKETS, ttl=None):
+        self._buckets = LRUCache(max_size, ttl)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (capacity, now))
+            tokens, retry_after = _consume(tokens, stamp, capacity, rate, now)
+
+            if retry_after == 0:
+                self._buckets.set(key, (tokens, now))
+
+            return retry_after
+
+
+class MongoBucketBackend:
+    """
+        Buckets shared by every worker, stored in the 'rate_limit_buckets' collection
+        and updated with compare-and-set so concurrent requests can't both take the
+        last token.
+    """
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        collection = RateLimitBucket._get_collection()
+        expires = datetime.utcfromtimestamp(now) + timedelta(seconds=capacity / rate)
+
+        for _ in range(MAX_SHARED_RETRIES):
+            bucket = collection.find_one({'_id': key})
+
+            if bucket is None:
+                tokens, retry_after = _consume(capacity, now, capacity, rate, now)
+                try:
+                    collection.insert_one({'_id': key, 'tokens': tokens, 'stamp': now, 'expires': expires})
+                    return retry_after
+                except DuplicateKeyError:
+                    continue
+
+            tokens, retry_after = _consume(bucket['tokens'], bucket['stamp'], capacity, rate, now)
+
+            if retry_after > 0:
+                return retry_after
+
+            result = collection.update_one(
+                {'_id': key, 'tokens': bucket['tokens'], 'stamp': bucket['stamp']},
+                {'$set': {'tokens': tokens, 'stamp': now, 'expires': expires}}
+            )
+
+            if result.modified_count == 1:
+                return 0
+
+        # Too much contention on this key, treat it as throttled
+        return 1 / rate
+
+
+class RateLimiter:
+    """
+        Token bucket rate limiter. Every request is first checked against a bucket
+        local to this process, so throttled requests are rejected without any database
+        access. When a shared backend is configured it is consulted afterwards, to
+        enforce the limit across all the workers.
+    """
+
+    SHARED_BACKENDS = {
+        'mongo': MongoBucketBackend
+    }
+
+    def __init__(self):
+        self.enabled = True
+        self.limits = {}
+        self.trust_proxy = False
+        self.local = MemoryBucketBackend()
+        self.shared = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('AUTH_RATE_LIMIT_ENABLED', True)
+        self.trust_proxy = app.config.get('AUTH_RATE_LIMIT_TRUST_PROXY', False)
+        self.limits = {
+            RateLimitScope.EMAIL: parse_limit(app.config.get('AUTH_RATE_LIMIT_EMAIL', DEFAULT_EMAIL_LIMIT)),
+            RateLimitScope.IP: parse_limit(app.config.get('AUTH_RATE_LIMIT_IP', DEFAULT_IP_LIMIT))
+        }
+
+        # An idle bucket refills completely within its period
+        max_period = max(capacity / rate for capacity, rate in self.limits.values())
+        self.local = MemoryBucketBackend(app.config.get('AUTH_RATE_LIMIT_LOCAL_BUCKETS', DEFAULT_LOCAL_BUCKETS), max_period)
+
+        backend = app.config.get('AUTH_RATE_LIMIT_BACKEND', None)
+        self.shared = self.SHARED_BACKENDS[backend]() if backend else None
+
+    def check(self, scope: str, value: str):
+        capacity, rate = self.limits[scope]
+        key = '{}:{}'.format(scope, value)
+        now = time()
+
+        retry_after = self.local.take(key, capacity, rate, now)
+
+        if retry_after == 0 and self.shared is not None:
+            retry_after = self.shared.take(key, capacity, rate, now)
+
+        if retry_after > 0:
+            raise TooManyRequests('too many requests, retry later', math.ceil(retry_after))
+
+    def client_address(self):
+        # Behind the Heroku router the last X-Forwarded-For entry is the real client
+        if self.trust_proxy and request.access_route:
+            return request.access_route[-1]
+
+        return request.remote_addr
+
+    def limit(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if self.enabled:
+                self.check(RateLimitScope.IP, self.client_address())
+
+                payload = get_request_payload(silent=True)
+                if isinstance(payload, dict) and isinstance(payload.get('email'), str):
+                    self.check(RateLimitScope.EMAIL, payload['email'].lower())
+
+            return func(*args, **kwargs)
+        return wrapper
@@ -1,14 +1,42 @@
 from .. import BASE_PATH
+from ... import on_write, WriteOp
+from ...models import Ingredient
+from .suggestions import IngredientSuggestions
+
+ingredient_suggestions = IngredientSuggestions()
 
 def create_module(app, api):
+
+    ingredient_suggestions.init_app(app)
     
-    from .resources import IngredientsList, IngredientInstance
+    from .resources import IngredientsList, IngredientTagsList, IngredientSuggestionsList, IngredientInstance
     
     api.add_resource(
         IngredientsList,
         BASE_PATH + '/ingredients'
     )
+    api.add_resource(
+        IngredientTagsList,
+        BASE_PATH + '/ingredients/tags'
+    )
+    api.add_resource(
+        IngredientSuggestionsList,
+        BASE_PATH + '/ingredients/suggest'
+    )
     api.add_resource(
         IngredientInstance,
         BASE_PATH + '/ingredients/<string:ingredient_id>'
-    )
\ No newline at end of file
+    )
+
+@on_write
+def _update_suggestions(op, coll_class, owner_id, document):
+    if coll_class is not Ingredient:
+        return
+
+    if document is None:
+        ingredient_suggestions.invalidate(owner_id)
+    elif op == WriteOp.DELETE:
+        ingredient_suggestions.remove(owner_id, document.pk)
+    elif document.name is not None:
+        # A patch without name leaves it unchanged
+        ingredient_suggestions.update(owner_id, document.pk, document.name)
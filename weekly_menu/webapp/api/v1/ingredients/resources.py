@@ -1,7 +1,7 @@
 import pprint
 
 from flask import jsonify
-from flask_restful import Resource, abort, request
+from flask_restful import Resource, abort, request, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from mongoengine.errors import NotUniqueError
 from mongoengine.fields import ObjectIdField
@@ -9,15 +9,21 @@ from mongoengine.queryset.visitor import Q
 
 from .schemas import IngredientSchema, PatchIngredientSchema, PutIngredientSchema
 from ...models import Ingredient, User, Recipe, ShoppingList
-from ... import validate_payload, get_payload, paginated, parse_query_args, mongo, load_user_info, put_document, patch_document, search_on_model
+from ... import validate_payload, get_payload, paginated, parse_query_args, mongo, load_user_info, put_document, patch_document, search_on_model, filtered, create_document, delete_document, get_tag_counts, apply_fields, QueryArgs, conditional, update_documents
 from ...exceptions import DuplicateEntry, BadRequest, Forbidden
+from . import ingredient_suggestions
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
 
 
 class IngredientsList(Resource):
     @jwt_required
     @parse_query_args
+    @filtered(Ingredient)
     @paginated
     @load_user_info
+    @conditional(Ingredient)
     def get(self, query_args, page_args, user_info: User):
         return search_on_model(Ingredient, Q(owner=str(user_info.id)), query_args, page_args)
 
@@ -29,7 +35,7 @@ class IngredientsList(Resource):
         ingredient.owner = user_info.id
 
         try:
-            ingredient.save()
+            create_document(ingredient)
         except NotUniqueError as nue:
             raise DuplicateEntry(
                 description="duplicate entry found for an ingredient", details=nue.args or [])
@@ -37,12 +43,53 @@ class IngredientsList(Resource):
         return ingredient, 201
 
 
+class IngredientTagsList(Resource):
+    @jwt_required
+    @load_user_info
+    def get(self, user_info: User):
+        return {
+            'results': get_tag_counts(Ingredient, user_info.id)
+        }
+
+
+class IngredientSuggestionsList(Resource):
+
+    suggest_reqparse = reqparse.RequestParser()
+    suggest_reqparse.add_argument(
+        'prefix',
+        type=str,
+        location=['args'],
+        required=False,
+        default=''
+    )
+    suggest_reqparse.add_argument(
+        'limit',
+        type=int,
+        location=['args'],
+        required=False,
+        default=DEFAULT_SUGGESTIONS
+    )
+
+    @jwt_required
+    @load_user_info
+    def get(self, user_info: User):
+        args = self.suggest_reqparse.parse_args()
+
+        if args['limit'] <= 0 or args['limit'] > MAX_SUGGESTIONS:
+            raise BadRequest('limit argument must be between 1 and {}'.format(MAX_SUGGESTIONS))
+
+        return {
+            'results': ingredient_suggestions.suggest(user_info.id, args['prefix'].strip(), args['limit'])
+        }
+
+
 class IngredientInstance(Resource):
     @jwt_required
     @load_user_info
+    @conditional(Ingredient, 'ingredient_id')
     def get(self, user_info: User, ingredient_id=''):
         if ingredient_id != None:
-            return Ingredient.objects(Q(_id=ingredient_id) & Q(owner=str(user_info.id))).get_or_404()
+            return apply_fields(Ingredient.objects(Q(_id=ingredient_id) & Q(owner=str(user_info.id))), request.args.get(QueryArgs.FIELDS)).get_or_404()
 
     @jwt_required
     @load_user_info
@@ -52,12 +99,12 @@ class IngredientInstance(Resource):
                 Q(_id=ingredient_id) & Q(owner=str(user_info.id))).get_or_404()
 
             # Removing references in embedded documents is not automatic (see: https://github.com/MongoEngine/mongoengine/issues/1592)
-            Recipe.objects(owner=user_info.id).update(
+            update_documents(Recipe.objects(owner=user_info.id, ingredients__ingredient=ingredient.id),
                 pull__ingredients__ingredient=ingredient.id)
-            ShoppingList.objects(owner=user_info.id).update(
+            update_documents(ShoppingList.objects(owner=user_info.id, items__item=ingredient.id),
                 pull__items__item=ingredient.id)
 
-            ingredient.delete()
+            delete_document(ingredient)
 
             return "", 204
 
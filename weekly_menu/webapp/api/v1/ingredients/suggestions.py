@@ -0,0 +1,104 @@
+import threading
+
+from bisect import bisect_left, insort
+
+from ...cache import LRUCache
+from ...models import Ingredient
+
+DEFAULT_SUGGESTIONS_CACHE_SIZE = 1024
+DEFAULT_SUGGESTIONS_CACHE_TTL = 300
+
+class NameIndex:
+    """
+        Ingredient names of a single owner as a sorted array of (folded name, id)
+        pairs: the names starting with a prefix are a contiguous slice, found with
+        a binary search.
+    """
+
+    def __init__(self, ingredients=()):
+        self._lock = threading.Lock()
+        self._names = {}
+        self._keys = []
+
+        for ingredient in ingredients:
+            self._names[ingredient['_id']] = ingredient.get('name') or ''
+
+        self._keys = sorted((name.casefold(), ingredient_id) for ingredient_id, name in self._names.items())
+
+    def add(self, ingredient_id, name: str):
+        with self._lock:
+            self._remove(ingredient_id)
+            self._names[ingredient_id] = name or ''
+            insort(self._keys, (self._names[ingredient_id].casefold(), ingredient_id))
+
+    def remove(self, ingredient_id):
+        with self._lock:
+            self._remove(ingredient_id)
+
+    def suggest(self, prefix: str, limit: int) -> list:
+        prefix = prefix.casefold()
+
+        with self._lock:
+            start = bisect_left(self._keys, (prefix,))
+            suggestions = []
+
+            for key, ingredient_id in self._keys[start:start + limit]:
+                if not key.startswith(prefix):
+                    break
+                suggestions.append({'_id': ingredient_id, 'name': self._names[ingredient_id]})
+
+            return suggestions
+
+    def _remove(self, ingredient_id):
+        name = self._names.pop(ingredient_id, None)
+
+        if name is not None:
+            del self._keys[bisect_left(self._keys, (name.casefold(), ingredient_id))]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class IngredientSuggestions:
+    """
+        Per-owner name indexes, built on the first suggestion and then kept up to date
+        by the writes of this process. Writes made by other workers are picked up when
+        the index expires.
+    """
+
+    def __init__(self):
+        self._indexes = LRUCache(DEFAULT_SUGGESTIONS_CACHE_SIZE, DEFAULT_SUGGESTIONS_CACHE_TTL)
+
+    def init_app(self, app):
+        self._indexes.configure(
+            app.config.get('INGREDIENT_SUGGESTIONS_CACHE_SIZE', DEFAULT_SUGGESTIONS_CACHE_SIZE),
+            app.config.get('INGREDIENT_SUGGESTIONS_CACHE_TTL', DEFAULT_SUGGESTIONS_CACHE_TTL)
+        )
+
+    def suggest(self, owner_id, prefix: str, limit: int) -> list:
+        index = self._indexes.get(str(owner_id))
+
+        if index is None:
+            index = NameIndex(Ingredient.objects(owner=owner_id).only('name').as_pymongo())
+            self._indexes.set(str(owner_id), index)
+
+        return index.suggest(prefix, limit)
+
+    def update(self, owner_id, ingredient_id, name: str):
+        # Indexes not built yet will read the new name from the database
+        index = self._indexes.get(str(owner_id))
+
+        if index is not None:
+            index.add(ingredient_id, name)
+
+    def remove(self, owner_id, ingredient_id):
+        index = self._indexes.get(str(owner_id))
+
+        if index is not None:
+            index.remove(ingredient_id)
+
+    def invalidate(self, owner_id):
+        self._indexes.invalidate(str(owner_id))
+
+    def clear(self):
+        self._indexes.clear()
@@ -2,12 +2,16 @@ from .. import BASE_PATH
 
 def create_module(app, api):
     
-    from .resources import MenuList, MenuInstance, MenuRecipesList, MenuRecipesInstance
+    from .resources import MenuList, MenuWeek, MenuInstance, MenuRecipesList, MenuRecipesInstance
     
     api.add_resource(
         MenuList,
         BASE_PATH + '/menus'
     )
+    api.add_resource(
+        MenuWeek,
+        BASE_PATH + '/menus/week/<string:iso_week>'
+    )
     api.add_resource(
         MenuInstance,
         BASE_PATH + '/menus/<string:menu_id>'
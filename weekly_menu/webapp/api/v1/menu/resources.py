@@ -1,7 +1,7 @@
 import pprint
 import re
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import jsonify
 from flask_restful import Resource, abort, request, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -11,17 +11,32 @@ from mongoengine.queryset.visitor import Q
 
 from .schemas import MenuSchema, PatchMenuSchema, PutMenuSchema, MenuRecipeSchema
 from ...models import Ingredient, User, menu, ShoppingList, Menu, Recipe
-from ... import validate_payload, paginated, mongo, load_user_info, put_document, patch_document, parse_query_args, search_on_model
+from ... import validate_payload, paginated, mongo, load_user_info, put_document, patch_document, parse_query_args, search_on_model, filtered, create_document, delete_document, apply_fields, QueryArgs, conditional, save_document, expand_document
+from ...expansion import parse_expand, expand
 from ...exceptions import DuplicateEntry, BadRequest
 
-def _dereference_recipes(menu: Menu):
-    if menu.recipes != None:
-        menu_recipes = [recipe.to_mongo()
-                            for recipe in menu.recipes]
-        menu = menu.to_mongo()
-        for i in range(len(menu_recipes)):
-            menu['recipes'][i] = menu_recipes[i]
-    return menu
+ISO_WEEK_REGEX = re.compile('^([0-9]{4})-?W([0-5][0-9])$')
+
+def _parse_iso_week(iso_week: str):
+    """
+        Return the first (monday) and last (sunday) day of an ISO 8601 week (YYYY-Www).
+    """
+    match = ISO_WEEK_REGEX.match(iso_week)
+
+    if match is None:
+        raise BadRequest('invalid week format, expected YYYY-Www')
+
+    year, week = map(int, match.groups())
+
+    # The 28th of December always falls in the last week of the year (there is no year 0)
+    if year < 1 or week < 1 or week > datetime(year, 12, 28).isocalendar()[1]:
+        raise BadRequest('invalid week parameter supplied: week {} of {}'.format(week, year))
+
+    # The 4th of January always falls in the first week of the year
+    jan_4 = datetime(year, 1, 4)
+    monday = jan_4 + timedelta(days=1 - jan_4.isoweekday(), weeks=week - 1)
+
+    return monday, monday + timedelta(days=6)
 
 class MenuList(Resource):
 
@@ -37,8 +52,10 @@ class MenuList(Resource):
 
     @jwt_required
     @parse_query_args
+    @filtered(Menu)
     @paginated
     @load_user_info
+    @conditional(Menu)
     def get(self, query_args, page_args, user_info: User):
         return search_on_model(Menu, Q(owner=str(user_info.id)), query_args, page_args)
     
@@ -50,25 +67,40 @@ class MenuList(Resource):
         menu.owner = user_info.id
         
         try:
-            menu.save()
+            create_document(menu)
         except NotUniqueError as nue:
             raise DuplicateEntry(description="duplicate entry found for a menu", details=nue.args or [])
         
         return menu, 201
 
+class MenuWeek(Resource):
+    @jwt_required
+    @load_user_info
+    @conditional(Menu)
+    def get(self, user_info: User, iso_week=''):
+        monday, sunday = _parse_iso_week(iso_week)
+
+        menus = Menu.objects(Q(owner=str(user_info.id)) & Q(date__gte=monday) & Q(date__lte=sunday)).order_by('+date', '+_id')
+
+        return {
+            'from': monday,
+            'to': sunday,
+            'results': expand(Menu, [menu.to_mongo() for menu in menus], parse_expand(Menu, request.args.get(QueryArgs.EXPAND)), user_info.id)
+        }
+
 class MenuInstance(Resource):
     @jwt_required
     @load_user_info
+    @conditional(Menu, 'menu_id')
     def get(self, user_info: User, menu_id=''):
-        menu = Menu.objects(Q(owner=str(user_info.id)) & Q(_id=menu_id)).get_or_404()
+        menu = apply_fields(Menu.objects(Q(owner=str(user_info.id)) & Q(_id=menu_id)), request.args.get(QueryArgs.FIELDS)).get_or_404()
 
-        #return _dereference_recipes(menu)
-        return menu
+        return expand_document(Menu, menu, request.args.get(QueryArgs.EXPAND), user_info.id)
     
     @jwt_required
     @load_user_info
     def delete(self, user_info: User, menu_id=''):
-        Menu.objects(Q(owner=str(user_info.id)) & Q(_id=menu_id)).get_or_404().delete()
+        delete_document(Menu.objects(Q(owner=str(user_info.id)) & Q(_id=menu_id)).get_or_404())
         return "", 204
     
     @jwt_required
@@ -123,7 +155,7 @@ class MenuRecipesList(Resource):
         else:
             menu.recipes = [recipe.id]
         
-        menu.save()
+        save_document(menu)
         return menu.recipes, 200
 
 
@@ -140,6 +172,6 @@ class MenuRecipesInstance(Resource):
 
         menu.recipes = [menu_menu for menu_menu in menu.recipes if menu_menu.ingredient.id != ingredient_id]
 
-        menu.save()
+        save_document(menu)
 
         return "", 204
@@ -2,12 +2,16 @@ from .. import BASE_PATH
 
 def create_module(app, api):
     
-    from .resources import RecipeList, RecipeInstance, RecipeIngredientsList, RecipeIngredientInstance
+    from .resources import RecipeList, RecipeTagsList, RecipeInstance, RecipeIngredientsList, RecipeIngredientInstance
     
     api.add_resource(
         RecipeList,
         BASE_PATH + '/recipes'
     )
+    api.add_resource(
+        RecipeTagsList,
+        BASE_PATH + '/recipes/tags'
+    )
     api.add_resource(
         RecipeInstance,
         BASE_PATH + '/recipes/<string:recipe_id>'
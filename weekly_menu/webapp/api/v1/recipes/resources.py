@@ -8,26 +8,18 @@ from mongoengine.fields import ObjectIdField, ObjectId
 from mongoengine.queryset.visitor import Q
 
 from .schemas import RecipeSchema, PatchRecipeSchema, PutRecipeSchema, RecipeIngredientSchema, RecipeIngredientWithoutRequiredIngredientSchema
-from ...models import Recipe, User, RecipeIngredient
-from ... import validate_payload, paginated, mongo, put_document, patch_document, load_user_info, patch_embedded_document, parse_query_args, search_on_model
+from ...models import Recipe, User, RecipeIngredient, Menu
+from ... import validate_payload, paginated, mongo, put_document, patch_document, load_user_info, patch_embedded_document, parse_query_args, search_on_model, filtered, create_document, delete_document, get_tag_counts, apply_fields, QueryArgs, conditional, save_document, update_documents, expand_document
 from ...exceptions import DuplicateEntry, BadRequest, Conflict, NotFound
 
 
-def _dereference_ingredients(recipe: Recipe):
-    if recipe.ingredients != None:
-        recipe_ingredients = [ing.ingredient.to_mongo()
-                            for ing in recipe.ingredients]
-        recipe = recipe.to_mongo()
-        for i in range(len(recipe_ingredients)):
-            recipe['ingredients'][i]['ingredient'] = recipe_ingredients[i]
-    return recipe
-
-
 class RecipeList(Resource):
     @jwt_required
     @parse_query_args
+    @filtered(Recipe)
     @paginated
     @load_user_info
+    @conditional(Recipe)
     def get(self, query_args, page_args, user_info: User):
         return search_on_model(Recipe, Q(owner=str(user_info.id)), query_args, page_args)
 
@@ -39,7 +31,7 @@ class RecipeList(Resource):
         recipe.owner = user_info.id
 
         try:
-            recipe.save()
+            create_document(recipe)
         except NotUniqueError as nue:
             raise DuplicateEntry(
                 description="duplicate entry found for a recipe", details=nue.args or [])
@@ -47,21 +39,35 @@ class RecipeList(Resource):
         return recipe, 201
 
 
+class RecipeTagsList(Resource):
+    @jwt_required
+    @load_user_info
+    def get(self, user_info: User):
+        return {
+            'results': get_tag_counts(Recipe, user_info.id)
+        }
+
+
 class RecipeInstance(Resource):
     @jwt_required
     @load_user_info
+    @conditional(Recipe, 'recipe_id')
     def get(self, user_info: User, recipe_id=''):
-        recipe = Recipe.objects(Q(_id=recipe_id) & Q(
-            owner=str(user_info.id))).get_or_404()
+        recipe = apply_fields(Recipe.objects(Q(_id=recipe_id) & Q(
+            owner=str(user_info.id))), request.args.get(QueryArgs.FIELDS)).get_or_404()
 
-        #return _dereference_ingredients(recipe)
-        return recipe
+        return expand_document(Recipe, recipe, request.args.get(QueryArgs.EXPAND), user_info.id)
 
     @jwt_required
     @load_user_info
     def delete(self, user_info: User, recipe_id=''):
-        Recipe.objects(Q(_id=recipe_id) & Q(
-            owner=str(user_info.id))).get_or_404().delete()
+        recipe = Recipe.objects(Q(_id=recipe_id) & Q(
+            owner=str(user_info.id))).get_or_404()
+
+        # Removed from menus here, so their update_timestamp changes too
+        update_documents(Menu.objects(owner=user_info.id, recipes=recipe.id), pull__recipes=recipe.id)
+
+        delete_document(recipe)
         return "", 204
 
     @jwt_required
@@ -115,7 +121,7 @@ class RecipeIngredientsList(Resource):
             raise Conflict('ingredient already present inside shopping list')
 
         recipe.ingredients.append(recipe_ingredient)
-        recipe.save()
+        save_document(recipe)
         return recipe_ingredient, 201
 
 
@@ -146,7 +152,7 @@ class RecipeIngredientInstance(Resource):
 
         recipe.ingredients = [recipe_ingredient for recipe_ingredient in recipe.ingredients if recipe_ingredient.ingredient.id != ingredient_id]
 
-        recipe.save()
+        save_document(recipe)
 
         return "", 204
 
@@ -161,7 +167,7 @@ class RecipeIngredientInstance(Resource):
                 recipe_ingredient = ing_doc = patch_embedded_document(recipe_ingredient, ing_doc)
                 break
 
-        recipe.save()
+        save_document(recipe)
 
         return recipe_ingredient, 200
 
@@ -174,6 +180,6 @@ class RecipeIngredientInstance(Resource):
         #if shopping_list_item.item != None and shopping_list_item_id != str(shopping_list_item.item.id):
         #    raise Conflict("can't update item {} with different item {}".format(str(shopping_list_item.item.id), shopping_list_item_id))
 
-        Recipe.objects(Q(_id=recipe_id) & Q(owner=str(user_info.id)) & Q(ingredients__ingredient=ingredient_id)).update(set__ingredients__S=recipe_ingredient)
+        update_documents(Recipe.objects(Q(_id=recipe_id) & Q(owner=str(user_info.id)) & Q(ingredients__ingredient=ingredient_id)), set__ingredients__S=recipe_ingredient)
 
         return recipe_ingredient, 200
\ No newline at end of file
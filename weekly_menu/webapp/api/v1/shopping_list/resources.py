@@ -9,23 +9,15 @@ from bson import ObjectId
 
 from .schemas import ShoppingListSchema, PutShoppingListSchema, PatchShoppingListSchema, ShoppingListItemSchema, ShoppingListItemWithoutRequiredItemSchema, ShoppingListItemWithoutRequiredItemSchema
 from ...models import ShoppingList, ShoppingListItem, User
-from ... import validate_payload, paginated, mongo, load_user_info, put_embedded_document, patch_embedded_document, put_document, patch_document, parse_query_args, search_on_model
+from ... import validate_payload, paginated, mongo, load_user_info, put_embedded_document, patch_embedded_document, put_document, patch_document, parse_query_args, search_on_model, create_document, delete_document, apply_fields, QueryArgs, conditional, save_document, update_documents, expand_document
 from ...exceptions import DuplicateEntry, BadRequest, Forbidden, Conflict, NotFound
 
-# def _dereference_item(shopping_list: ShoppingListItem):
-#     if shopping_list.items != None:
-#         shopping_list_items = [item.item.to_mongo()
-#                             for item in shopping_list.items]
-#         shopping_list = shopping_list.to_mongo()
-#         for i in range(len(shopping_list_items)):
-#             shopping_list['items'][i]['item'] = shopping_list_items[i]
-#     return shopping_list
-
 class UserShoppingLists(Resource):
     @jwt_required
     @parse_query_args
     @paginated
     @load_user_info
+    @conditional(ShoppingList)
     def get(self, query_args, page_args, user_info: User): 
         return search_on_model(ShoppingList, Q(owner=str(user_info.id)), query_args, page_args)
 
@@ -37,7 +29,7 @@ class UserShoppingLists(Resource):
         shopping_list.owner = user_info.id
         
         try:
-            shopping_list.save()
+            create_document(shopping_list)
         except NotUniqueError as nue:
             raise DuplicateEntry(
                 description="duplicate entry found for a shopping list", details=nue.args or [])
@@ -47,17 +39,17 @@ class UserShoppingLists(Resource):
 class UserShoppingList(Resource):
     @jwt_required
     @load_user_info
+    @conditional(ShoppingList, 'shopping_list_id')
     def get(self, user_info: User, shopping_list_id: str): 
-        shopping_list = ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id))).get_or_404()
+        shopping_list = apply_fields(ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id))), request.args.get(QueryArgs.FIELDS)).get_or_404()
 
-        #return _dereference_item(shopping_list)
-        return shopping_list
+        return expand_document(ShoppingList, shopping_list, request.args.get(QueryArgs.EXPAND), user_info.id)
 
     @jwt_required
     @load_user_info
     def delete(self, user_info: User, shopping_list_id=''):
-        ShoppingList.objects(Q(_id=shopping_list_id) & Q(
-            owner=str(user_info.id))).get_or_404().delete()
+        delete_document(ShoppingList.objects(Q(_id=shopping_list_id) & Q(
+            owner=str(user_info.id))).get_or_404())
         return "", 204
 
     @jwt_required
@@ -110,7 +102,7 @@ class UserShoppingListItems(Resource):
             raise Conflict('ingredient already present inside shopping list')
 
         shopping_list.items.append(shopping_list_item)
-        shopping_list.save()
+        save_document(shopping_list)
 
         return shopping_list, 201
     
@@ -145,7 +137,7 @@ class UserShoppingListItem(Resource):
                 shopping_list_item = item_doc = patch_embedded_document(shopping_list_item, item_doc)
                 break
 
-        base_shopping_list.save()
+        save_document(base_shopping_list)
 
         return shopping_list_item, 200
 
@@ -158,13 +150,13 @@ class UserShoppingListItem(Resource):
         #if shopping_list_item.item != None and shopping_list_item_id != str(shopping_list_item.item.id):
         #    raise Conflict("can't update item {} with different item {}".format(str(shopping_list_item.item.id), shopping_list_item_id))
 
-        ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id)) & Q(items__item=shopping_list_item_id)).update(set__items__S=shopping_list_item)
+        update_documents(ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id)) & Q(items__item=shopping_list_item_id)), set__items__S=shopping_list_item)
 
         return shopping_list_item, 200
 
     @jwt_required
     @load_user_info
     def delete(self, user_info: User, shopping_list_id: str, shopping_list_item_id: str):
-        ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id))).update(pull__items__item=ObjectId(shopping_list_item_id))
+        update_documents(ShoppingList.objects(Q(_id=shopping_list_id) & Q(owner=str(user_info.id)) & Q(items__item=shopping_list_item_id)), pull__items__item=ObjectId(shopping_list_item_id))
 
         return '', 204
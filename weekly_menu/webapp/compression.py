@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import zlib
+
+from flask import request
+
+from .api.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    # Optional, only gzip is offered without it
+    brotli = None
+
+class Encoding:
+    BR = 'br'
+    GZIP = 'gzip'
+
+DEFAULT_COMPRESS_MIMETYPES = ['application/json', 'application/msgpack']
+DEFAULT_COMPRESS_MIN_SIZE = 500
+DEFAULT_COMPRESS_LEVEL = 6
+DEFAULT_COMPRESS_BR_LEVEL = 4
+DEFAULT_COMPRESS_CACHE_SIZE = 256
+DEFAULT_COMPRESS_CACHE_TTL = 300
+
+def _gzip_compressor(level: int):
+    # wbits 31: gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def _br_compressor(level: int):
+    compressor = brotli.Compressor(quality=level)
+    return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+
+
+class Compression:
+    """
+        Negotiated gzip/brotli compression of the responses. Bodies smaller than
+        COMPRESS_MIN_SIZE are sent as they are, streamed ones are compressed chunk
+        by chunk. Compressed bodies of responses with an ETag are kept by (body
+        digest, mimetype, encoding): the same representation is compressed once.
+        Weak ETags don't identify the body, so they are not part of the key.
+    """
+
+    def __init__(self):
+        self.mimetypes = DEFAULT_COMPRESS_MIMETYPES
+        self.min_size = DEFAULT_COMPRESS_MIN_SIZE
+        self.levels = {Encoding.GZIP: DEFAULT_COMPRESS_LEVEL, Encoding.BR: DEFAULT_COMPRESS_BR_LEVEL}
+        self.encodings = [Encoding.BR, Encoding.GZIP] if brotli is not None else [Encoding.GZIP]
+        self._cache = LRUCache(DEFAULT_COMPRESS_CACHE_SIZE, DEFAULT_COMPRESS_CACHE_TTL)
+
+    def init_app(self, app):
+        self.mimetypes = app.config.get('COMPRESS_MIMETYPES', DEFAULT_COMPRESS_MIMETYPES)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', DEFAULT_COMPRESS_MIN_SIZE)
+        self.levels = {
+            Encoding.GZIP: app.config.get('COMPRESS_LEVEL', DEFAULT_COMPRESS_LEVEL),
+            Encoding.BR: app.config.get('COMPRESS_BR_LEVEL', DEFAULT_COMPRESS_BR_LEVEL)
+        }
+        self._cache.configure(
+            app.config.get('COMPRESS_CACHE_SIZE', DEFAULT_COMPRESS_CACHE_SIZE),
+            app.config.get('COMPRESS_CACHE_TTL', DEFAULT_COMPRESS_CACHE_TTL)
+        )
+
+        if app.config.get('COMPRESS_ENABLED', True):
+            app.after_request(self.compress_response)
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        if encoding == Encoding.BR:
+            return brotli.compress(data, quality=self.levels[Encoding.BR])
+
+        return gzip.compress(data, self.levels[Encoding.GZIP])
+
+    def compress_response(self, response):
+        if response.status_code != 200 or response.mimetype not in self.mimetypes \
+                or 'Content-Encoding' in response.headers:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+
+            if len(data) < self.min_size:
+                return response
+
+            response.set_data(self._compress_cached(response, data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def clear(self):
+        self._cache.clear()
+
+    def _compress_cached(self, response, data: bytes, encoding: str) -> bytes:
+        etag, _ = response.get_etag()
+
+        if etag is None:
+            return self.compress(data, encoding)
+
+        key = (hashlib.sha1(data).digest(), response.mimetype, encoding)
+        compressed = self._cache.get(key)
+
+        if compressed is None:
+            compressed = self.compress(data, encoding)
+            self._cache.set(key, compressed)
+
+        return compressed
+
+    def _compress_stream(self, chunks, encoding: str):
+        if encoding == Encoding.BR:
+            process, finish = _br_compressor(self.levels[Encoding.BR])
+        else:
+            process, finish = _gzip_compressor(self.levels[Encoding.GZIP])
+
+        try:
+            # Each chunk is flushed, so it reaches the client as soon as it is produced
+            for chunk in chunks:
+                if chunk:
+                    yield process(chunk)
+
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+
+compression = Compression()